@@ -0,0 +1,171 @@
+import random
+import sys
+import time
+import tracemalloc
+
+from logic import *
+from knights_knaves_generator import character_names, character_symbols, generate_puzzle
+
+# Puzzle sizes to benchmark, as numbers of characters
+SIZES = [3, 4, 5, 6, 8, 10, 12, 15, 20, 30, 40, 50]
+
+# Statements per character
+STATEMENTS = 2
+
+# Nesting depths of the "X said that" claims in the nested puzzles
+DEPTHS = [2, 5, 10, 20, 40]
+
+# Characters in the nested puzzles
+NESTED_CHARACTERS = 5
+
+# Largest number of symbols the enumeration backends are run on
+ENUMERATION_SYMBOLS = 16
+
+# Largest number of symbols the resolution prover is run on
+RESOLUTION_LIMIT = 40
+
+# Deepest nested claim the resolution prover is run on, since chains of
+# biconditionals need exponentially many resolvents
+RESOLUTION_DEPTH_LIMIT = 2
+
+
+def enumeration(knowledge, symbols):
+    """Solves a puzzle with `model_check`, one query per symbol."""
+    return {s.name for s in symbols
+            if model_check(knowledge, s, method="enumerate")}
+
+
+def parallel_enumeration(knowledge, symbols):
+    """Solves a puzzle with the sharded process pool `model_check`."""
+    return {s.name for s in symbols
+            if find_counter_model(knowledge, s) is None}
+
+
+def resolution_prover(knowledge, symbols):
+    """Solves a puzzle with the set-of-support resolution prover."""
+    return {s.name for s in symbols
+            if model_check(knowledge, s, method="resolution")}
+
+
+def solver(knowledge, symbols):
+    """Solves a puzzle with one incremental `KnowledgeBase`."""
+    kb = KnowledgeBase(knowledge)
+    return {s.name for s in symbols if kb.entails(s)}
+
+
+def simplified_solver(knowledge, symbols):
+    """Solves a puzzle with a `KnowledgeBase` over the simplified knowledge."""
+    kb = KnowledgeBase(simplify(knowledge))
+    return {s.name for s in symbols if kb.entails(s)}
+
+
+BACKENDS = [
+    ("enumeration", enumeration, ENUMERATION_SYMBOLS),
+    ("parallel", parallel_enumeration, ENUMERATION_SYMBOLS),
+    ("resolution", resolution_prover, RESOLUTION_LIMIT),
+    ("solver", solver, None),
+    ("simplified", simplified_solver, None)
+]
+
+
+def nested_puzzle(n, depth, seed=None):
+    """
+    Generates a knights and knaves puzzle with `n` characters, whose one
+    statement is nested exactly `depth` levels deep, as in
+    "A says B said that C said that ... D is a knight".
+    Returns the knowledge base and the list of symbols to ask about.
+    """
+    rng = random.Random(seed)
+    names = character_names(n)
+    world = dict()
+    knowledge = And()
+    symbols = []
+
+    # There is at least one knight and one knave, so any claim has a speaker
+    kinds = [True, False] + [rng.random() < 0.5 for _ in range(n - 2)]
+    rng.shuffle(kinds)
+    for name, is_knight in zip(names, kinds):
+        knight, knave = character_symbols(name)
+        world[knight.name] = is_knight
+        world[knave.name] = not is_knight
+        knowledge.add(Biconditional(knight, Not(knave)))
+        symbols.extend([knight, knave])
+
+    # Each level wraps the claim in "X said that"
+    sentence, _ = character_symbols(rng.choice(names))
+    for _ in range(depth):
+        knight, _ = character_symbols(rng.choice(names))
+        sentence = Biconditional(knight, sentence)
+
+    # The speaker is a knight exactly when the claim holds in the world
+    truthful = sentence.evaluate(world)
+    speaker = rng.choice([name for name in names
+                          if world[f"{name} is a Knight"] == truthful])
+    knight, _ = character_symbols(speaker)
+    knowledge.add(Biconditional(knight, sentence))
+    return knowledge, symbols
+
+
+def measure(backend, knowledge, symbols):
+    """
+    Runs a backend, returning its answer, wall time in seconds and
+    peak memory in KiB. Memory used by pool workers is not counted.
+
+    Tracing allocations slows Python code down a lot, so the backend is
+    timed in one run and its memory traced in another.
+    """
+    start = time.perf_counter()
+    answer = backend(knowledge, symbols)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    backend(knowledge, symbols)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return answer, elapsed, peak / 1024
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [max_characters]")
+    largest = int(sys.argv[1]) if len(sys.argv) == 2 else max(SIZES)
+
+    print(f"{'n':>5} {'backend':>12} {'time (s)':>10} "
+          f"{'memory (KiB)':>13} {'agrees':>7}")
+    for n in SIZES:
+        if n > largest:
+            break
+        knowledge, symbols, _ = generate_puzzle(n, STATEMENTS * n, seed=n)
+        compare(n, knowledge, symbols)
+
+    print()
+    print(f"Nested claims, {NESTED_CHARACTERS} characters")
+    print(f"{'depth':>5} {'backend':>12} {'time (s)':>10} "
+          f"{'memory (KiB)':>13} {'agrees':>7}")
+    for depth in DEPTHS:
+        knowledge, symbols = nested_puzzle(NESTED_CHARACTERS, depth, seed=depth)
+        skip = {"resolution"} if depth > RESOLUTION_DEPTH_LIMIT else set()
+        compare(depth, knowledge, symbols, skip)
+
+
+def compare(label, knowledge, symbols, skip=()):
+    """
+    Runs every backend not named in `skip` on a puzzle, printing a row
+    for each labelled with `label`, and whether it agrees with the first
+    backend run.
+    """
+    answers = dict()
+    for name, backend, limit in BACKENDS:
+        if name in skip or limit is not None and len(symbols) > limit:
+            print(f"{label:>5} {name:>12} {'skipped':>10}")
+            continue
+        answer, elapsed, memory = measure(backend, knowledge, symbols)
+        answers[name] = answer
+        reference = next(iter(answers.values()))
+        agrees = "yes" if answer == reference else "NO"
+        print(f"{label:>5} {name:>12} {elapsed:>10.4f} "
+              f"{memory:>13.1f} {agrees:>7}")
+
+
+if __name__ == "__main__":
+    main()
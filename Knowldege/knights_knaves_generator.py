@@ -0,0 +1,106 @@
+import random
+
+from logic import *
+
+
+def character_names(n):
+    """Returns `n` character names: A to Z, then P26, P27 and so on."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return [letters[i] if i < len(letters) else f"P{i}" for i in range(n)]
+
+
+def character_symbols(name):
+    """Returns the knight and knave symbols of a character."""
+    return Symbol(f"{name} is a Knight"), Symbol(f"{name} is a Knave")
+
+
+def random_claim(names, depth, rng):
+    """
+    Returns a random claim as a (sentence, text) pair.
+
+    With `depth` greater than 0 the claim may be nested, as in
+    "B said that C is a knave": B's statement is true exactly when B
+    is a knight, so that claim is Biconditional(BKnight, CKnave).
+    """
+    kind = rng.choice(["is", "is", "same", "either", "said"] if depth
+                      else ["is", "is", "same", "either"])
+
+    if kind == "said":
+        speaker = rng.choice(names)
+        knight, _ = character_symbols(speaker)
+        sentence, text = random_claim(names, depth - 1, rng)
+        return Biconditional(knight, sentence), f"{speaker} said that {text}"
+
+    if kind == "is":
+        name = rng.choice(names)
+        knight, knave = character_symbols(name)
+        if rng.random() < 0.5:
+            return knight, f"{name} is a knight"
+        return knave, f"{name} is a knave"
+
+    first, second = rng.sample(names, 2) if len(names) > 1 else names * 2
+    first_knight, first_knave = character_symbols(first)
+    second_knight, second_knave = character_symbols(second)
+    if kind == "same":
+        sentence = Or(And(first_knight, second_knight),
+                      And(first_knave, second_knave))
+        return sentence, f"{first} and {second} are the same kind"
+    sentence = Or(first_knave, second_knave)
+    return sentence, f"{first} or {second} is a knave"
+
+
+def generate_puzzle(n, m, depth=2, seed=None):
+    """
+    Generates a random knights and knaves puzzle with `n` characters
+    and `m` statements, nested up to `depth` levels of "X said that".
+
+    A hidden world is drawn first and every speaker is chosen to fit it,
+    so the puzzle always has at least one solution.
+    Returns the knowledge base, the list of symbols to ask about,
+    and the statements as text.
+    """
+    rng = random.Random(seed)
+    names = character_names(n)
+    world = dict()
+    knowledge = And()
+    symbols = []
+
+    # Every character is either a knight or a knave, but not both
+    for name in names:
+        knight, knave = character_symbols(name)
+        is_knight = rng.random() < 0.5
+        world[knight.name] = is_knight
+        world[knave.name] = not is_knight
+        knowledge.add(Biconditional(knight, Not(knave)))
+        symbols.extend([knight, knave])
+
+    statements = []
+    while len(statements) < m:
+        sentence, text = random_claim(names, depth, rng)
+
+        # Knights only say true things and knaves only say false things,
+        # so a claim nobody could make is drawn again
+        truthful = sentence.evaluate(world)
+        speakers = [name for name in names
+                    if world[f"{name} is a Knight"] == truthful]
+        if not speakers:
+            continue
+        speaker = rng.choice(speakers)
+        knight, _ = character_symbols(speaker)
+        knowledge.add(Biconditional(knight, sentence))
+        statements.append(f'{speaker} says "{text}."')
+
+    return knowledge, symbols, statements
+
+
+def main():
+    knowledge, symbols, statements = generate_puzzle(3, 4, seed=0)
+    for statement in statements:
+        print(statement)
+    for symbol in symbols:
+        if model_check(knowledge, symbol):
+            print(f"    {symbol}")
+
+
+if __name__ == "__main__":
+    main()
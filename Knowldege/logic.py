@@ -1,4 +1,5 @@
 import itertools
+import multiprocessing
 
 
 class Sentence():
@@ -69,6 +70,34 @@ class Symbol(Sentence):
         return {self.name}
 
 
+class Constant(Sentence):
+
+    def __init__(self, value):
+        self.value = bool(value)
+
+    def __eq__(self, other):
+        return isinstance(other, Constant) and self.value == other.value
+
+    def __hash__(self):
+        return hash(("constant", self.value))
+
+    def __repr__(self):
+        return "TRUE" if self.value else "FALSE"
+
+    def evaluate(self, model):
+        return self.value
+
+    def formula(self):
+        return "⊤" if self.value else "⊥"
+
+    def symbols(self):
+        return set()
+
+
+TRUE = Constant(True)
+FALSE = Constant(False)
+
+
 class Not(Sentence):
     def __init__(self, operand):
         Sentence.validate(operand)
@@ -217,16 +246,55 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
     def symbols(self):
         return set.union(self.left.symbols(), self.right.symbols())
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+# Largest number of symbols that model_check enumerates by default
+ENUMERATION_LIMIT = 10
+
+
+def model_check(knowledge, query, processes=None, shard_bits=None,
+                method="auto"):
+    """
+    Checks if knowledge base entails query.
+
+    `method` picks the inference engine: "enumerate" checks every model,
+    "forward" uses forward chaining (Horn knowledge bases and symbol
+    queries only), "resolution" uses the resolution prover and "solver"
+    a `KnowledgeBase`. With "auto", Horn knowledge bases are forward
+    chained, small ones enumerated and the rest handed to the solver.
+
+    If `processes` is given, the models are enumerated in parallel
+    shards on a process pool (see `find_counter_model`).
+    """
+    if processes is not None:
+        return find_counter_model(
+            knowledge, query, processes=processes, shard_bits=shard_bits
+        ) is None
+
+    if method == "auto":
+        clauses = horn_clauses(knowledge)
+        if clauses is not None and isinstance(query, Symbol):
+            return forward_chaining(clauses, query.name)
+        symbols = set.union(knowledge.symbols(), query.symbols())
+        method = "enumerate" if len(symbols) <= ENUMERATION_LIMIT else "solver"
+
+    if method == "forward":
+        clauses = horn_clauses(knowledge)
+        if clauses is None or not isinstance(query, Symbol):
+            raise ValueError("forward chaining needs Horn knowledge and a symbol query")
+        return forward_chaining(clauses, query.name)
+    if method == "resolution":
+        return resolution(knowledge, query)
+    if method == "solver":
+        return KnowledgeBase(knowledge).entails(query)
+    if method != "enumerate":
+        raise ValueError(f"unknown inference method {method}")
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -261,3 +329,954 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def search_shard(knowledge, query, symbols, model):
+    """
+    Enumerates every completion of the partial `model` over `symbols`.
+    Returns the first model in which knowledge is true and query is false,
+    or None if knowledge entails query in all of them.
+    """
+    for values in itertools.product((True, False), repeat=len(symbols)):
+        model.update(zip(symbols, values))
+        if knowledge.evaluate(model) and not query.evaluate(model):
+            return dict(model)
+    return None
+
+
+def _search_shard(args):
+    """Process pool entry point for `search_shard`."""
+    return search_shard(*args)
+
+
+def find_counter_model(knowledge, query, processes=None, shard_bits=None):
+    """
+    Returns a model in which knowledge is true but query is false,
+    or None if knowledge entails query.
+
+    The first `shard_bits` symbols are fixed to split the 2^n models
+    into 2^k shards. With `processes` set to anything other than 1, the
+    shards are searched on a process pool which is terminated as soon
+    as any shard reports a counter-model.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if shard_bits is None:
+
+        # A few shards per worker evens out the load between them
+        shard_bits = (4 * processes - 1).bit_length()
+    shard_bits = min(shard_bits, len(symbols))
+
+    fixed, free = symbols[:shard_bits], symbols[shard_bits:]
+    shards = [
+        (knowledge, query, free, dict(zip(fixed, values)))
+        for values in itertools.product((True, False), repeat=len(fixed))
+    ]
+
+    if processes == 1:
+        for shard in shards:
+            counter_model = search_shard(*shard)
+            if counter_model is not None:
+                return counter_model
+        return None
+
+    with multiprocessing.Pool(processes) as pool:
+        for counter_model in pool.imap_unordered(_search_shard, shards):
+            if counter_model is not None:
+
+                # Leaving the block terminates the remaining workers
+                return counter_model
+    return None
+
+
+class CNF():
+    """
+    Clause form of logical sentences, built with the Tseitin encoding.
+
+    Variables are numbered from 1 and a literal is a variable number,
+    negated when the literal is false. Every compound subformula gets an
+    auxiliary variable defined to be equivalent to it, so the models of
+    the clauses correspond one to one with the models of the sentences.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.variables = dict()
+        self.names = dict()
+        self.definitions = dict()
+        self.count = 0
+
+    def new_variable(self):
+        """Returns a fresh auxiliary variable."""
+        self.count += 1
+        return self.count
+
+    def variable(self, name):
+        """Returns the variable standing for the symbol called `name`."""
+        if name not in self.variables:
+            variable = self.new_variable()
+            self.variables[name] = variable
+            self.names[variable] = name
+        return self.variables[name]
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`, defining it if needed."""
+        Sentence.validate(sentence)
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if isinstance(sentence, Constant):
+            if TRUE not in self.definitions:
+                self.definitions[TRUE] = self.new_variable()
+                self.clauses.append(frozenset({self.definitions[TRUE]}))
+            true = self.definitions[TRUE]
+            return true if sentence.value else -true
+        if sentence in self.definitions:
+            return self.definitions[sentence]
+
+        if isinstance(sentence, And):
+            literals = [self.literal(c) for c in sentence.conjuncts]
+            v = self.new_variable()
+            for literal in literals:
+                self.clauses.append(frozenset({-v, literal}))
+            self.clauses.append(frozenset({v, *(-l for l in literals)}))
+        elif isinstance(sentence, Or):
+            literals = [self.literal(d) for d in sentence.disjuncts]
+            v = self.new_variable()
+            for literal in literals:
+                self.clauses.append(frozenset({v, -literal}))
+            self.clauses.append(frozenset({-v, *literals}))
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            v = self.new_variable()
+            self.clauses.extend([
+                frozenset({-v, -a, b}), frozenset({v, a}), frozenset({v, -b})
+            ])
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            v = self.new_variable()
+            self.clauses.extend([
+                frozenset({-v, -a, b}), frozenset({-v, a, -b}),
+                frozenset({v, a, b}), frozenset({v, -a, -b})
+            ])
+        else:
+            raise TypeError(f"cannot encode {sentence}")
+
+        self.definitions[sentence] = v
+        return v
+
+    def add(self, sentence):
+        """Asserts `sentence`, adding its clauses."""
+        Sentence.validate(sentence)
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                frozenset(self.literal(d) for d in sentence.disjuncts)
+            )
+        else:
+            self.clauses.append(frozenset({self.literal(sentence)}))
+
+
+def propagate(clauses, literals):
+    """
+    Assigns `literals` and applies unit propagation to `clauses`.
+    Returns the remaining clauses and the set of assigned literals,
+    or None if a clause is falsified.
+    """
+    assigned = set()
+    pending = list(literals)
+    while pending:
+        assigned.update(pending)
+        if any(-literal in assigned for literal in pending):
+            return None
+        reduced = []
+        units = []
+        for clause in clauses:
+            if not clause.isdisjoint(assigned):
+                continue
+            clause = frozenset(l for l in clause if -l not in assigned)
+            if not clause:
+                return None
+            if len(clause) == 1:
+                units.extend(clause)
+            reduced.append(clause)
+        clauses = reduced
+        pending = [l for l in set(units) if l not in assigned]
+    return clauses, assigned
+
+
+def models(knowledge, symbols=()):
+    """
+    Lazily yields every model of `knowledge` as a dictionary from symbol
+    names to truth values, over the symbols of the knowledge base plus
+    any extra symbol names in `symbols`.
+
+    For a counter-model of a failed entailment, take the first model of
+    And(knowledge, Not(query)).
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    for name in sorted(set.union(knowledge.symbols(), set(symbols))):
+        cnf.variable(name)
+    result = propagate(cnf.clauses, [])
+    if result is None:
+        return
+
+    def enumerate_models(clauses, assigned):
+        """Yields the models extending the partial assignment."""
+
+        # Branch on symbols only, since auxiliary variables are determined
+        free = [v for v in cnf.names if v not in assigned and -v not in assigned]
+        if clauses and free:
+            counts = dict()
+            for clause in clauses:
+                for literal in clause:
+                    if abs(literal) in cnf.names:
+                        counts[abs(literal)] = counts.get(abs(literal), 0) + 1
+            if counts:
+                v = max(counts, key=counts.get)
+                for literal in (v, -v):
+                    result = propagate(clauses, [literal])
+                    if result is not None:
+                        yield from enumerate_models(
+                            result[0], assigned | result[1]
+                        )
+                return
+
+        # Every remaining clause mentions auxiliary variables only
+        if clauses and not satisfiable(clauses):
+            return
+        for values in itertools.product((True, False), repeat=len(free)):
+            model = {
+                cnf.names[v]: v in assigned
+                for v in cnf.names if v in assigned or -v in assigned
+            }
+            model.update((cnf.names[v], value) for v, value in zip(free, values))
+            yield model
+
+    yield from enumerate_models(*result)
+
+
+def satisfiable(clauses):
+    """Checks whether a set of clauses has a model, using DPLL."""
+    if not clauses:
+        return True
+    literal = next(iter(clauses[0]))
+    for choice in (literal, -literal):
+        result = propagate(clauses, [choice])
+        if result is not None and satisfiable(result[0]):
+            return True
+    return False
+
+
+def count_models(knowledge, symbols=()):
+    """
+    Returns the number of models of `knowledge` over its symbols plus any
+    extra symbol names in `symbols`, without enumerating them.
+
+    The clauses are split into components that share no variables, which
+    are counted separately and multiplied, and the count of every
+    component is cached so that it is reused across branches.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    for name in set.union(knowledge.symbols(), set(symbols)):
+        cnf.variable(name)
+    result = propagate(cnf.clauses, [])
+    if result is None:
+        return 0
+    clauses, assigned = result
+    cache = dict()
+
+    def variables(clauses):
+        return {abs(literal) for clause in clauses for literal in clause}
+
+    def components(clauses):
+        """Splits clauses into groups that share no variables."""
+        by_variable = dict()
+        for clause in clauses:
+            for literal in clause:
+                by_variable.setdefault(abs(literal), []).append(clause)
+        seen = set()
+        groups = []
+        for clause in clauses:
+            if clause in seen:
+                continue
+            seen.add(clause)
+            group, frontier = [clause], [clause]
+            while frontier:
+                for literal in frontier.pop():
+                    for other in by_variable[abs(literal)]:
+                        if other not in seen:
+                            seen.add(other)
+                            group.append(other)
+                            frontier.append(other)
+            groups.append(group)
+        return groups
+
+    def count(clauses):
+        """Counts the models of clauses over the variables they mention."""
+        if not clauses:
+            return 1
+        key = frozenset(clauses)
+        if key in cache:
+            return cache[key]
+
+        groups = components(clauses)
+        if len(groups) > 1:
+            total = 1
+            for group in groups:
+                total *= count(group)
+        else:
+            occurrences = dict()
+            for clause in clauses:
+                for literal in clause:
+                    occurrences[abs(literal)] = occurrences.get(abs(literal), 0) + 1
+            v = max(occurrences, key=occurrences.get)
+            before = variables(clauses)
+            total = 0
+            for literal in (v, -v):
+                result = propagate(clauses, [literal])
+                if result is None:
+                    continue
+                reduced, assigned = result
+
+                # Variables that dropped out unassigned are unconstrained
+                free = before - variables(reduced) - {abs(l) for l in assigned}
+                total += count(reduced) * 2 ** len(free)
+
+        cache[key] = total
+        return total
+
+    free = (set(range(1, cnf.count + 1)) - variables(clauses)
+            - {abs(l) for l in assigned})
+    return count(clauses) * 2 ** len(free)
+
+
+# Operator spellings accepted by `parse`, including the ones `formula` prints
+TOKENS = {
+    "<=>": "<=>", "<->": "<=>",
+    "=>": "=>", "->": "=>",
+    "¬": "¬", "~": "¬", "!": "¬",
+    "∧": "∧", "&": "∧",
+    "∨": "∨", "|": "∨",
+    "(": "(", ")": ")",
+    "⊤": "⊤", "⊥": "⊥"
+}
+
+
+def tokenize(text):
+    """
+    Splits a formula into operator tokens and symbol names.
+    A symbol name is any run of text between operators, so names
+    may contain spaces, as in "A is a Knight".
+    """
+    tokens = []
+    name = ""
+    i = 0
+    while i < len(text):
+        for spelling in sorted(TOKENS, key=len, reverse=True):
+            if text.startswith(spelling, i):
+                if name.strip():
+                    tokens.append(("symbol", name.strip()))
+                name = ""
+                tokens.append((TOKENS[spelling], spelling))
+                i += len(spelling)
+                break
+        else:
+            name += text[i]
+            i += 1
+    if name.strip():
+        tokens.append(("symbol", name.strip()))
+    return tokens
+
+
+def parse(text):
+    """
+    Parses the textual syntax printed by `formula` into a sentence.
+
+    From loosest to tightest binding the operators are <=>, =>, ∨, ∧
+    and ¬; <=> and => group to the right. ASCII spellings (<->, ->, |,
+    &, ~, !) are accepted as well.
+    """
+    tokens = tokenize(text)
+    position = 0
+
+    def peek():
+        return tokens[position][0] if position < len(tokens) else None
+
+    def expect(kind):
+        nonlocal position
+        if peek() != kind:
+            found = tokens[position][1] if position < len(tokens) else "end"
+            raise ValueError(f"expected {kind} but found {found}")
+        position += 1
+        return tokens[position - 1][1]
+
+    def biconditional():
+        left = implication()
+        if peek() == "<=>":
+            expect("<=>")
+            return Biconditional(left, biconditional())
+        return left
+
+    def implication():
+        antecedent = disjunction()
+        if peek() == "=>":
+            expect("=>")
+            return Implication(antecedent, implication())
+        return antecedent
+
+    def disjunction():
+        disjuncts = [conjunction()]
+        while peek() == "∨":
+            expect("∨")
+            disjuncts.append(conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction():
+        conjuncts = [negation()]
+        while peek() == "∧":
+            expect("∧")
+            conjuncts.append(negation())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def negation():
+        if peek() == "¬":
+            expect("¬")
+            return Not(negation())
+        return atom()
+
+    def atom():
+        kind = peek()
+        if kind == "(":
+            expect("(")
+            sentence = biconditional()
+            expect(")")
+            return sentence
+        if kind == "⊤":
+            expect("⊤")
+            return TRUE
+        if kind == "⊥":
+            expect("⊥")
+            return FALSE
+        return Symbol(expect("symbol"))
+
+    sentence = biconditional()
+    if position != len(tokens):
+        raise ValueError(f"unexpected {tokens[position][1]}")
+    return sentence
+
+
+def simplify(sentence):
+    """
+    Returns an equivalent sentence that is usually much smaller.
+
+    Nested conjunctions and disjunctions are flattened and deduplicated,
+    constants are folded, negations are pushed inward down to symbols,
+    and tautologies such as Biconditional(A, A) become TRUE.
+    """
+    Sentence.validate(sentence)
+    if isinstance(sentence, Not):
+        return negate(simplify(sentence.operand))
+    if isinstance(sentence, And):
+        return conjoin([simplify(c) for c in sentence.conjuncts])
+    if isinstance(sentence, Or):
+        return disjoin([simplify(d) for d in sentence.disjuncts])
+    if isinstance(sentence, Implication):
+        return implies(simplify(sentence.antecedent),
+                       simplify(sentence.consequent))
+    if isinstance(sentence, Biconditional):
+        return equivalent(simplify(sentence.left), simplify(sentence.right))
+    return sentence
+
+
+def negate(sentence):
+    """Returns the negation of a simplified sentence, pushed inward."""
+    if isinstance(sentence, Constant):
+        return FALSE if sentence.value else TRUE
+    if isinstance(sentence, Not):
+        return sentence.operand
+    if isinstance(sentence, And):
+        return disjoin([negate(c) for c in sentence.conjuncts])
+    if isinstance(sentence, Or):
+        return conjoin([negate(d) for d in sentence.disjuncts])
+    if isinstance(sentence, Implication):
+        return conjoin([sentence.antecedent, negate(sentence.consequent)])
+    if isinstance(sentence, Biconditional):
+        return Biconditional(sentence.left, negate(sentence.right))
+    return Not(sentence)
+
+
+def conjoin(conjuncts):
+    """Builds a flat, deduplicated conjunction of simplified sentences."""
+    items = dict()
+    for conjunct in conjuncts:
+        for item in (conjunct.conjuncts if isinstance(conjunct, And)
+                     else [conjunct]):
+            if item == FALSE:
+                return FALSE
+            if item != TRUE:
+                items[item] = None
+    for item in items:
+        if isinstance(item, Not) and item.operand in items:
+            return FALSE
+    if not items:
+        return TRUE
+    if len(items) == 1:
+        return next(iter(items))
+    return And(*items)
+
+
+def disjoin(disjuncts):
+    """Builds a flat, deduplicated disjunction of simplified sentences."""
+    items = dict()
+    for disjunct in disjuncts:
+        for item in (disjunct.disjuncts if isinstance(disjunct, Or)
+                     else [disjunct]):
+            if item == TRUE:
+                return TRUE
+            if item != FALSE:
+                items[item] = None
+    for item in items:
+        if isinstance(item, Not) and item.operand in items:
+            return TRUE
+    if not items:
+        return FALSE
+    if len(items) == 1:
+        return next(iter(items))
+    return Or(*items)
+
+
+def implies(antecedent, consequent):
+    """Builds an implication between simplified sentences, folding constants."""
+    if antecedent == FALSE or consequent == TRUE or antecedent == consequent:
+        return TRUE
+    if antecedent == TRUE:
+        return consequent
+    if consequent == FALSE:
+        return negate(antecedent)
+    return Implication(antecedent, consequent)
+
+
+def equivalent(left, right):
+    """Builds a biconditional between simplified sentences, folding constants."""
+    if left == right:
+        return TRUE
+    if isinstance(left, Constant):
+        return right if left.value else negate(right)
+    if isinstance(right, Constant):
+        return left if right.value else negate(left)
+    if (isinstance(left, Not) and left.operand == right
+            or isinstance(right, Not) and right.operand == left):
+        return FALSE
+    return Biconditional(left, right)
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver over CNF literals.
+
+    Clauses can be added between calls to `solve`, and clauses learned
+    from conflicts are kept, so later calls reuse the earlier work.
+    Each call can be made under temporary assumptions.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.watches = dict()
+        self.values = dict()
+        self.levels = dict()
+        self.reasons = dict()
+        self.trail = []
+        self.limits = []
+        self.head = 0
+        self.activity = dict()
+        self.bump = 1.0
+        self.phases = dict()
+        self.ok = True
+
+    def value(self, literal):
+        """Returns the truth value of a literal, or None if unassigned."""
+        value = self.values.get(abs(literal))
+        if value is None:
+            return None
+        return value if literal > 0 else not value
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = literal > 0
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def backtrack(self, level):
+        """Undoes every assignment made above decision level `level`."""
+        if len(self.limits) <= level:
+            return
+        for literal in self.trail[self.limits[level]:]:
+            variable = abs(literal)
+            self.phases[variable] = self.values.pop(variable)
+            del self.levels[variable]
+            del self.reasons[variable]
+        del self.trail[self.limits[level]:]
+        del self.limits[level:]
+        self.head = min(self.head, len(self.trail))
+
+    def watch(self, index):
+        clause = self.clauses[index]
+        for literal in clause[:2]:
+            self.watches.setdefault(literal, []).append(index)
+
+    def add_clause(self, literals):
+        """Adds a clause, returning False if the clauses became unsatisfiable."""
+        self.backtrack(0)
+        literals = set(literals)
+        for literal in literals:
+            self.activity.setdefault(abs(literal), 0.0)
+        if not self.ok or any(-literal in literals for literal in literals):
+            return self.ok
+        if any(self.value(literal) is True for literal in literals):
+            return True
+        clause = [literal for literal in literals if self.value(literal) is None]
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(clause)
+            self.watch(len(self.clauses) - 1)
+        return self.ok
+
+    def propagate(self):
+        """
+        Applies unit propagation to the pending assignments.
+        Returns the index of a falsified clause, or None.
+        """
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches.get(false, [])
+            kept = []
+            for position, index in enumerate(watching):
+                clause = self.clauses[index]
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(index)
+                    continue
+
+                # Look for a replacement literal to watch
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if self.value(clause[0]) is False:
+                        kept.extend(watching[position + 1:])
+                        self.watches[false] = kept
+                        return index
+                    self.assign(clause[0], index)
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a learned clause from a conflict using the first unique
+        implication point. Returns the clause and the level to backjump to.
+        """
+        level = len(self.limits)
+        learned = []
+        seen = set()
+        pending = 0
+        literal = None
+        position = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if literal is not None and variable == abs(literal):
+                    continue
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.activity[variable] += self.bump
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learned.append(other)
+            while abs(self.trail[position]) not in seen:
+                position -= 1
+            literal = self.trail[position]
+            position -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(literal)]]
+
+        learned.insert(0, -literal)
+        if len(learned) == 1:
+            return learned, 0
+
+        # Watch the literal assigned latest among the rest
+        highest = max(range(1, len(learned)),
+                      key=lambda i: self.levels[abs(learned[i])])
+        learned[1], learned[highest] = learned[highest], learned[1]
+        return learned, self.levels[abs(learned[1])]
+
+    def decide(self):
+        """Returns the unassigned variable with the highest activity, or None."""
+        free = [v for v in self.activity if v not in self.values]
+        if not free:
+            return None
+        return max(free, key=self.activity.get)
+
+    def solve(self, assumptions=()):
+        """
+        Checks whether the clauses are satisfiable with every literal in
+        `assumptions` true. On success, `values` holds a model until the
+        solver is next modified.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+        assumptions = list(assumptions)
+        for literal in assumptions:
+            self.activity.setdefault(abs(literal), 0.0)
+
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.clauses.append(learned)
+                    self.watch(len(self.clauses) - 1)
+                    self.assign(learned[0], len(self.clauses) - 1)
+                self.bump *= 1.05
+                continue
+
+            # Assumptions are made first, one per decision level
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                value = self.value(literal)
+                if value is False:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.decide()
+            if variable is None:
+                return True
+            self.limits.append(len(self.trail))
+            phase = self.phases.get(variable, False)
+            self.assign(variable if phase else -variable, None)
+
+
+class KnowledgeBase():
+    """
+    Knowledge base that keeps its clauses in a live `Solver`.
+
+    Sentences are encoded once, as they are added, and queries are
+    answered by the same solver under temporary assumptions, so nothing
+    is re-encoded or re-learned between queries.
+    """
+
+    def __init__(self, *sentences):
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.sentences = []
+        for sentence in sentences:
+            self.add(sentence)
+
+    def encode(self, start):
+        """Passes the clauses created since `start` on to the solver."""
+        for clause in self.cnf.clauses[start:]:
+            self.solver.add_clause(clause)
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to `sentence`, defining it if needed."""
+        start = len(self.cnf.clauses)
+        literal = self.cnf.literal(sentence)
+        self.encode(start)
+        return literal
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        start = len(self.cnf.clauses)
+        self.cnf.add(sentence)
+        self.encode(start)
+        self.sentences.append(sentence)
+
+    def knowledge(self):
+        """Returns the knowledge base as a single sentence."""
+        return And(*self.sentences)
+
+    def consistent(self, assumptions=()):
+        """Checks whether the knowledge base and `assumptions` have a model."""
+        literals = [self.literal(sentence) for sentence in assumptions]
+        return self.solver.solve(literals)
+
+    def entails(self, query, assumptions=()):
+        """Checks if knowledge base, together with `assumptions`, entails query."""
+        literals = [self.literal(sentence) for sentence in assumptions]
+        return not self.solver.solve(literals + [-self.literal(query)])
+
+    def model(self, assumptions=()):
+        """
+        Returns a model of the knowledge base and `assumptions` as a
+        dictionary from symbol names to truth values, or None.
+        """
+        if not self.consistent(assumptions):
+            return None
+        return {
+            name: self.solver.values.get(variable, False)
+            for name, variable in self.cnf.variables.items()
+        }
+
+
+def horn_clauses(knowledge):
+    """
+    Extracts definite Horn clauses from a knowledge base made of symbols,
+    conjunctions and implications from a conjunction of symbols to a
+    conjunction of symbols. Each clause is a (premises, conclusion) pair
+    of a set of symbol names and a symbol name. Returns None if the
+    knowledge base is not of that form.
+    """
+
+    def names(sentence):
+        """Returns the names in a conjunction of symbols, or None."""
+        if isinstance(sentence, Symbol):
+            return [sentence.name]
+        if isinstance(sentence, And):
+            result = []
+            for conjunct in sentence.conjuncts:
+                conjunct_names = names(conjunct)
+                if conjunct_names is None:
+                    return None
+                result.extend(conjunct_names)
+            return result
+        return None
+
+    clauses = []
+    pending = [knowledge]
+    while pending:
+        sentence = pending.pop()
+        if sentence == TRUE:
+            continue
+        if isinstance(sentence, And):
+            pending.extend(sentence.conjuncts)
+        elif isinstance(sentence, Symbol):
+            clauses.append((frozenset(), sentence.name))
+        elif isinstance(sentence, Implication):
+            premises = names(sentence.antecedent)
+            conclusions = names(sentence.consequent)
+            if premises is None or conclusions is None:
+                return None
+            for conclusion in conclusions:
+                clauses.append((frozenset(premises), conclusion))
+        else:
+            return None
+    return clauses
+
+
+def forward_chaining(clauses, query):
+    """
+    Checks if Horn `clauses` entail the symbol named `query`.
+
+    Each clause keeps a count of its premises not yet known to be true,
+    and an agenda of newly inferred symbols decrements them, so every
+    clause is visited once per premise and the check takes linear time.
+    """
+    count = [len(premises) for premises, _ in clauses]
+    watching = dict()
+    agenda = []
+    for index, (premises, conclusion) in enumerate(clauses):
+        if not premises:
+            agenda.append(conclusion)
+        for premise in premises:
+            watching.setdefault(premise, []).append(index)
+
+    inferred = set()
+    while agenda:
+        symbol = agenda.pop()
+        if symbol == query:
+            return True
+        if symbol in inferred:
+            continue
+        inferred.add(symbol)
+        for index in watching.get(symbol, []):
+            count[index] -= 1
+            if count[index] == 0:
+                agenda.append(clauses[index][1])
+    return False
+
+
+def resolution(knowledge, query):
+    """
+    Checks if knowledge base entails query by refuting knowledge ∧ ¬query
+    with resolution.
+
+    Only resolvents that descend from the negated query are generated
+    (the set-of-support strategy), which can only refute a consistent
+    knowledge base, so an inconsistent one is caught first: it entails
+    every query. Tautologies and clauses subsumed by a shorter clause are
+    discarded, and clauses subsumed by a new clause are removed.
+    """
+    if not KnowledgeBase(knowledge).consistent():
+        return True
+
+    cnf = CNF()
+    cnf.add(knowledge)
+    start = len(cnf.clauses)
+    cnf.clauses.append(frozenset({-cnf.literal(query)}))
+
+    def tautology(clause):
+        return any(-literal in clause for literal in clause)
+
+    def subsumed(clause, clauses):
+        return any(other <= clause for other in clauses)
+
+    usable = []
+    for clause in sorted(cnf.clauses[:start], key=len):
+        if not tautology(clause) and not subsumed(clause, usable):
+            usable.append(clause)
+    support = [clause for clause in cnf.clauses[start:]
+               if not tautology(clause)]
+    if frozenset() in usable or frozenset() in support:
+        return True
+
+    while support:
+        given = min(support, key=len)
+        support.remove(given)
+        usable.append(given)
+        for other in list(usable):
+            for literal in given:
+                if -literal not in other:
+                    continue
+                resolvent = (given - {literal}) | (other - {-literal})
+                if not resolvent:
+                    return True
+                if (tautology(resolvent) or subsumed(resolvent, usable)
+                        or subsumed(resolvent, support)):
+                    continue
+                usable = [c for c in usable if not resolvent <= c]
+                support = [c for c in support if not resolvent <= c]
+                support.append(resolvent)
+    return False
@@ -1,5 +1,13 @@
 import itertools
+import math
 import random
+from fractions import Fraction
+
+import numpy as np
+from scipy import ndimage
+
+# Prior probability that an unknown cell is a mine, when the total is unknown
+DENSITY = 0.15
 
 
 class Minesweeper(): #handles gameplay
@@ -15,24 +23,36 @@ class Minesweeper(): #handles gameplay
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.width):
-            row = []
-            for j in range(self.height):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((width, height), dtype=bool)
+
+        # Add mines randomly, sampling cells without replacement
+        for index in random.sample(range(width * height), mines):
+            i, j = divmod(index, height)
+            self.mines.add((i, j))
+            self.board[i, j] = True
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(width)
-            j = random.randrange(height)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        self.count_mines()
 
         # At first, player has found no mines
         self.mines_found = set()
 
+    def count_mines(self):
+        """
+        Computes the number of nearby mines of every cell at once, by
+        summing the eight shifted copies of the zero-padded board,
+        and labels the connected regions of cells with no nearby mines.
+        """
+        padded = np.pad(self.board, 1).astype(np.uint8)
+        self.counts = np.zeros((self.width, self.height), dtype=np.uint8)
+        for i in range(3):
+            for j in range(3):
+                if (i, j) != (1, 1):
+                    self.counts += padded[i:i + self.width, j:j + self.height]
+
+        empty = (self.counts == 0) & ~self.board
+        self.regions, _ = ndimage.label(empty, structure=np.ones((3, 3)))
+        self.region_slices = ndimage.find_objects(self.regions)
+
     def print(self):
         """
         Prints a text-based representation
@@ -41,7 +61,7 @@ class Minesweeper(): #handles gameplay
         for i in range(self.width):
             print("--" * self.height + "-")
             for j in range(self.height):
-                if self.board[i][j]:
+                if self.board[i, j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -49,8 +69,7 @@ class Minesweeper(): #handles gameplay
         print("--" * self.height + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +77,159 @@ class Minesweeper(): #handles gameplay
         within one row and column of a given cell,
         not including the cell itself.
         """
+        return int(self.counts[cell])
 
-        # Keep count of nearby mines
-        count = 0
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, as a dictionary from revealed cells to their
+        number of nearby mines. If the cell has no nearby mines, its whole
+        connected region of such cells is revealed together with the
+        cells bordering it, as in real Minesweeper.
+        """
+        region = self.regions[cell]
+        if not region:
+            return {cell: self.nearby_mines(cell)}
+
+        # Grow the region's bounding box by one cell to take in its border
+        rows, columns = self.region_slices[region - 1]
+        top, left = max(rows.start - 1, 0), max(columns.start - 1, 0)
+        window = (slice(top, rows.stop + 1), slice(left, columns.stop + 1))
+        inside = self.regions[window] == region
+        shown = ndimage.binary_dilation(inside, structure=np.ones((3, 3)))
+
+        revealed = dict()
+        for i, j in zip(*np.nonzero(shown)):
+            cell = (top + int(i), left + int(j))
+            revealed[cell] = int(self.counts[cell])
+        return revealed
 
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
+    def won(self):
+        """
+        Checks if all mines have been flagged.
+        """
+        return self.mines_found == self.mines
 
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
 
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.width and 0 <= j < self.height:
-                    if self.board[i][j]: #if the cell contains True which means there is a mine
-                        count += 1
+class SparseMinesweeper():
+    """
+    Minesweeper game that only stores where the mines are, for boards
+    too large to hold as grids.
+
+    Without `chunk_size`, exactly `mines` cells are sampled without
+    replacement up front. With it, the board is cut into square chunks
+    whose mines are only drawn when a cell in or next to the chunk is
+    first looked at, each chunk from its own seeded generator, so the
+    board can be effectively unbounded. Each chunk then gets `density`
+    of its cells as mines (by default, `mines` over the board size).
+    """
+
+    def __init__(self, height=8, width=8, mines=8, chunk_size=None,
+                 density=None, seed=None):
+        self.height = height
+        self.width = width
+        self.chunk_size = chunk_size
+        self.seed = random.randrange(2 ** 63) if seed is None else seed
+
+        # Mines of each chunk generated so far
+        self.chunks = dict()
+
+        if chunk_size is None:
+            generator = random.Random(self.seed)
+            self.chunks[None] = {
+                divmod(index, height)
+                for index in generator.sample(range(width * height), mines)
+            }
+            self.total_mines = mines
+        else:
+            self.density = mines / (width * height) if density is None else density
+
+            # Chunks are full-sized except along the far edges of the board
+            self.total_mines = 0
+            for rows, row_chunks in self.chunk_sizes(width):
+                for columns, column_chunks in self.chunk_sizes(height):
+                    self.total_mines += (row_chunks * column_chunks
+                                         * self.chunk_mines(rows, columns))
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    def chunk_sizes(self, length):
+        """
+        Returns (size, number of chunks) pairs covering a side of `length`.
+        """
+        full, rest = divmod(length, self.chunk_size)
+        return [(size, count) for size, count in
+                [(self.chunk_size, full), (rest, 1)] if size and count]
 
-        return count
+    def chunk_mines(self, rows, columns):
+        """Returns the number of mines in a chunk of the given size."""
+        return round(self.density * rows * columns)
+
+    def chunk(self, cell):
+        """
+        Returns the set of mines in the chunk holding `cell`,
+        generating the chunk if needed.
+        """
+        if self.chunk_size is None:
+            return self.chunks[None]
+        key = (cell[0] // self.chunk_size, cell[1] // self.chunk_size)
+        if key not in self.chunks:
+            top, left = key[0] * self.chunk_size, key[1] * self.chunk_size
+            rows = min(self.chunk_size, self.width - top)
+            columns = min(self.chunk_size, self.height - left)
+            generator = random.Random(f"{self.seed}:{key[0]}:{key[1]}")
+            cells = generator.sample(range(rows * columns),
+                                     self.chunk_mines(rows, columns))
+            self.chunks[key] = {(top + index // columns, left + index % columns)
+                                for index in cells}
+        return self.chunks[key]
+
+    @property
+    def mines(self):
+        """
+        Returns the set of mines, or with chunks, of the mines in the
+        chunks generated so far.
+        """
+        return set().union(*self.chunks.values())
+
+    def is_mine(self, cell):
+        i, j = cell
+        if not (0 <= i < self.width and 0 <= j < self.height):
+            return False
+        return cell in self.chunk(cell)
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        return sum(
+            self.is_mine((cell[0] + i, cell[1] + j))
+            for i in (-1, 0, 1) for j in (-1, 0, 1) if i or j
+        )
+
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, as a dictionary from revealed cells to their
+        number of nearby mines, flooding out from cells with no nearby
+        mines as in real Minesweeper.
+        """
+        revealed = {cell: self.nearby_mines(cell)}
+        frontier = [cell]
+        while frontier:
+            i, j = frontier.pop()
+            if revealed[(i, j)]:
+                continue
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    neighbor = (i + di, j + dj)
+                    if (neighbor not in revealed
+                            and 0 <= neighbor[0] < self.width
+                            and 0 <= neighbor[1] < self.height):
+                        revealed[neighbor] = self.nearby_mines(neighbor)
+                        frontier.append(neighbor)
+        return revealed
 
     def won(self):
         """
@@ -84,32 +238,157 @@ class Minesweeper(): #handles gameplay
         return self.mines_found == self.mines
 
 
+# Sentence windows already shifted or normalized, by mask and offset
+WINDOW_SHIFTS = dict()
+NORMAL_WINDOWS = dict()
+
+
+def shift_window(mask, di, dj):
+    """
+    Moves the cells of a 3x3 window mask down by `di` rows and right by
+    `dj` columns. Returns the new mask, or None if a cell leaves the window.
+    """
+    key = (mask, di, dj)
+    if key not in WINDOW_SHIFTS:
+        shifted = 0
+        for bit in range(9):
+            if mask >> bit & 1:
+                i, j = divmod(bit, 3)
+                i, j = i + di, j + dj
+                if not (0 <= i < 3 and 0 <= j < 3):
+                    shifted = None
+                    break
+                shifted |= 1 << (3 * i + j)
+        WINDOW_SHIFTS[key] = shifted
+    return WINDOW_SHIFTS[key]
+
+
+def normal_window(mask):
+    """
+    Returns the (rows, columns, mask) that move a non-empty window mask
+    up and left until its first row and first column are occupied.
+    """
+    if mask not in NORMAL_WINDOWS:
+        rows = [mask >> (3 * i) & 0b111 for i in range(3)]
+        di = next(i for i, row in enumerate(rows) if row)
+        columns = rows[0] | rows[1] | rows[2]
+        dj = next(j for j in range(3) if columns >> j & 1)
+        NORMAL_WINDOWS[mask] = (di, dj, shift_window(mask, -di, -dj))
+    return NORMAL_WINDOWS[mask]
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The cells of a sentence always fit in the 3x3 neighbourhood of the
+    cell it came from, so they are kept as a 9-bit mask over a window
+    whose top-left cell is `origin`. The window is normalized to start
+    at the sentence's first row and column, so equal sets of cells have
+    equal origins and masks.
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        cells = set(cells)
         self.count = count
+        self.origin = (0, 0)
+        self.mask = 0
+        if cells:
+            top = min(i for i, _ in cells)
+            left = min(j for _, j in cells)
+            self.origin = (top, left)
+            for cell in cells:
+                bit = self.bit(cell)
+                if not bit:
+                    raise ValueError("sentence cells must fit in a 3x3 window")
+                self.mask |= bit
+
+    @classmethod
+    def from_mask(cls, origin, mask, count):
+        """
+        Returns the sentence about the cells of `mask` in the window at `origin`.
+        """
+        sentence = cls((), count)
+        sentence.origin = origin
+        sentence.mask = mask
+        sentence.normalize()
+        return sentence
+
+    @property
+    def cells(self):
+        top, left = self.origin
+        return {(top + bit // 3, left + bit % 3)
+                for bit in range(9) if self.mask >> bit & 1}
+
+    def __len__(self):
+        return self.mask.bit_count()
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self.same_cells(other) and self.count == other.count
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
     def __hash__(self):
-        return hash((frozenset(self.cells), self.count))
+        return hash((self.origin, self.mask, self.count))
+
+    def bit(self, cell):
+        """
+        Returns the bit of a cell in this sentence's window, or 0 if the
+        cell is outside the window.
+        """
+        i = cell[0] - self.origin[0]
+        j = cell[1] - self.origin[1]
+        if 0 <= i < 3 and 0 <= j < 3:
+            return 1 << (3 * i + j)
+        return 0
+
+    def normalize(self):
+        """
+        Moves the window so that it starts at the first row and column
+        holding a cell.
+        """
+        if self.mask:
+            di, dj, self.mask = normal_window(self.mask)
+            self.origin = (self.origin[0] + di, self.origin[1] + dj)
 
+    def relative_mask(self, other):
+        """
+        Returns the cells of `other` as a mask over this sentence's window,
+        or None if some of them fall outside it.
+        """
+        di = other.origin[0] - self.origin[0]
+        dj = other.origin[1] - self.origin[1]
+        if abs(di) > 2 or abs(dj) > 2:
+            return None if other.mask else 0
+        return shift_window(other.mask, di, dj)
+
+    def same_cells(self, other):
+        return self.origin == other.origin and self.mask == other.mask
+
+    def issubset(self, other):
+        """
+        Checks whether every cell of this sentence is a cell of `other`.
+        """
+        mask = other.relative_mask(self)
+        return mask is not None and not mask & ~other.mask
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of this sentence that are
+        not in `other`, where `other` is a subset of this sentence.
+        """
+        mask = self.relative_mask(other)
+        return Sentence.from_mask(self.origin, self.mask & ~mask,
+                                  self.count - other.count)
 
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
+        if len(self) == self.count:
             return self.cells
         return set()
 
@@ -127,9 +406,11 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be a mine.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
             self.count -= 1
+            self.normalize()
 
 
     def mark_safe(self, cell):
@@ -137,8 +418,10 @@ class Sentence():
         Updates internal knowledge representation given the fact that
         a cell is known to be safe.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
+        bit = self.bit(cell)
+        if self.mask & bit:
+            self.mask ^= bit
+            self.normalize()
 
 
 class MinesweeperAI(): #handles inferring which moves to make based on knowledge
@@ -146,12 +429,21 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, verbose=False,
+                 max_knowledge=10000, density=DENSITY):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Whether to print what is inferred from each move
+        self.verbose = verbose
+
+        # Total number of mines on the board, if known, and otherwise
+        # the prior probability of any unknown cell being a mine
+        self.total_mines = mines
+        self.density = density
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -159,8 +451,29 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells that have not been clicked on yet
+        self.safe_moves = set()
+
+        # Sentences about the game known to be true, by sentence id
+        self.knowledge = dict()
+
+        # Ids of the sentences that mention each cell
+        self.cell_index = dict()
+
+        # Id of the one sentence kept about each set of cells
+        self.sentence_by_cells = dict()
+
+        # Most sentences kept, and the latest move, from which the
+        # sentences furthest away are dropped when there are too many
+        self.max_knowledge = max_knowledge
+        self.last_move = None
+
+        # Ids of sentences that changed since inference last looked at them
+        self.worklist = []
+        self.sentence_ids = itertools.count()
+
+        # Mine configurations of frontier components already enumerated
+        self.configuration_cache = dict()
 
     def mark_mine(self, cell):
         """
@@ -168,8 +481,8 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        for sentence_id in self.cell_index.pop(cell, ()):
+            self.update_sentence(sentence_id, cell, True)
 
     def mark_safe(self, cell):
         """
@@ -177,9 +490,227 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        if cell not in self.moves_made:
+            self.safe_moves.add(cell)
+        for sentence_id in self.cell_index.pop(cell, ()):
+            self.update_sentence(sentence_id, cell, False)
+
+    def update_sentence(self, sentence_id, cell, mine):
+        """
+        Takes a cell now known to be a mine or safe out of a sentence.
+        If another sentence is already about the remaining cells, this
+        one is dropped as a duplicate.
+        """
+        sentence = self.knowledge[sentence_id]
+        del self.sentence_by_cells[(sentence.origin, sentence.mask)]
+        if mine:
+            sentence.mark_mine(cell)
+        else:
             sentence.mark_safe(cell)
 
+        key = (sentence.origin, sentence.mask)
+        if sentence.mask and key in self.sentence_by_cells:
+            self.remove_sentence(sentence_id)
+            return
+        if sentence.mask:
+            self.sentence_by_cells[key] = sentence_id
+        self.worklist.append(sentence_id)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base, unless a sentence about
+        the same cells is already known.
+        """
+        key = (sentence.origin, sentence.mask)
+        if not sentence.mask or key in self.sentence_by_cells:
+            return
+
+        sentence_id = next(self.sentence_ids)
+        self.knowledge[sentence_id] = sentence
+        self.sentence_by_cells[key] = sentence_id
+        for cell in sentence.cells:
+            self.cell_index.setdefault(cell, set()).add(sentence_id)
+        self.worklist.append(sentence_id)
+
+        if len(self.knowledge) > self.max_knowledge:
+            self.compact()
+
+    def compact(self):
+        """
+        Drops the sentences furthest from the latest move until the
+        knowledge base is back to three quarters of its largest size.
+        Dropping a sentence loses information but never makes the
+        remaining knowledge wrong.
+        """
+        if self.last_move is None:
+            return
+        i, j = self.last_move
+
+        def distance(sentence_id):
+            top, left = self.knowledge[sentence_id].origin
+            return max(abs(top - i), abs(left - j))
+
+        keep = self.max_knowledge * 3 // 4
+        furthest = sorted(self.knowledge, key=distance, reverse=True)
+        for sentence_id in furthest[:len(self.knowledge) - keep]:
+            self.remove_sentence(sentence_id)
+
+    def remove_sentence(self, sentence_id):
+        """
+        Removes a sentence from the knowledge base and returns it.
+        """
+        sentence = self.knowledge.pop(sentence_id)
+        key = (sentence.origin, sentence.mask)
+        if self.sentence_by_cells.get(key) == sentence_id:
+            del self.sentence_by_cells[key]
+        for cell in sentence.cells:
+            self.cell_index[cell].discard(sentence_id)
+            if not self.cell_index[cell]:
+                del self.cell_index[cell]
+        return sentence
+
+    def infer(self):
+        """
+        Draws every conclusion that follows from the sentences in the
+        worklist: cells that are all safe or all mines are marked, and
+        a sentence that is a subset of another gives their difference.
+        Only sentences that share a cell are compared.
+
+        The larger sentence follows from the subset and the difference,
+        so it is replaced by the difference rather than kept alongside.
+        """
+        while self.worklist:
+            sentence_id = self.worklist.pop()
+            if sentence_id not in self.knowledge:
+                continue
+            sentence = self.knowledge[sentence_id]
+
+            if not sentence.mask or sentence.count == 0:
+                for safe in self.remove_sentence(sentence_id).cells:
+                    self.mark_safe(safe)
+                continue
+
+            if len(sentence) == sentence.count:
+                for mine in self.remove_sentence(sentence_id).cells:
+                    self.mark_mine(mine)
+                continue
+
+            overlapping = set()
+            for cell in sentence.cells:
+                overlapping |= self.cell_index[cell]
+            overlapping.discard(sentence_id)
+
+            for other_id in overlapping:
+                if sentence_id not in self.knowledge:
+                    break
+                if other_id not in self.knowledge:
+                    continue
+                other = self.knowledge[other_id]
+                if sentence.issubset(other):
+                    self.remove_sentence(other_id)
+                    self.add_sentence(other.difference(sentence))
+                elif other.issubset(sentence):
+                    self.remove_sentence(sentence_id)
+                    self.add_sentence(sentence.difference(other))
+
+    def solve_linear(self):
+        """
+        Marks cells whose value follows from the knowledge base read as a
+        system of linear equations, one per sentence, plus one equation
+        for the total number of mines when it is known. The cells not
+        mentioned by any sentence enter that equation as a single
+        variable between 0 and their number.
+
+        The system is brought to reduced row echelon form, and a row is
+        decided when its total can only be reached with every variable at
+        one of its bounds. This only runs when no safe move is known,
+        and repeats while it keeps finding cells.
+        """
+        while not self.safe_moves:
+            safes, mines = self.linear_deductions()
+            if not safes and not mines:
+                return
+            for cell in mines:
+                self.mark_mine(cell)
+            for cell in safes:
+                self.mark_safe(cell)
+            self.infer()
+
+    def linear_deductions(self):
+        """
+        Returns the sets of cells that the linear equations of the
+        knowledge base force to be safe and to be mines.
+        """
+        cells = list(self.cell_index)
+        column = {cell: k for k, cell in enumerate(cells)}
+        interior = (self.width * self.height - len(self.mines)
+                    - len(self.safes) - len(cells))
+        bounds = [1] * len(cells) + [interior]
+
+        equations = [({column[cell]: Fraction(1) for cell in sentence.cells},
+                      Fraction(sentence.count))
+                     for sentence in self.knowledge.values()]
+        if self.total_mines is not None:
+            total = {k: Fraction(1) for k in range(len(bounds)) if bounds[k]}
+            equations.append((total, Fraction(self.total_mines - len(self.mines))))
+        if not equations:
+            return set(), set()
+
+        def subtract(row, factor, other):
+            row = dict(row)
+            for k, value in other.items():
+                row[k] = row.get(k, 0) - factor * value
+                if not row[k]:
+                    del row[k]
+            return row
+
+        # Gauss-Jordan elimination over sparse rows
+        reduced = []
+        for row, total in equations:
+            for pivot, other, other_total in reduced:
+                if pivot in row:
+                    factor = row[pivot]
+                    row = subtract(row, factor, other)
+                    total -= factor * other_total
+            if not row:
+                continue
+            pivot = min(row)
+            factor = row[pivot]
+            row = {k: value / factor for k, value in row.items()}
+            total /= factor
+            for index, (other_pivot, other, other_total) in enumerate(reduced):
+                if pivot in other:
+                    factor = other[pivot]
+                    reduced[index] = (other_pivot, subtract(other, factor, row),
+                                      other_total - factor * total)
+            reduced.append((pivot, row, total))
+
+        safes, mines = set(), set()
+        for _, row, total in reduced:
+            highest = sum(value * bounds[k] for k, value in row.items() if value > 0)
+            lowest = sum(value * bounds[k] for k, value in row.items() if value < 0)
+            if total != highest and total != lowest:
+                continue
+            for k, value in row.items():
+                at_bound = (value > 0) == (total == highest)
+                if k == len(cells):
+                    interior_cells = self.interior_cells()
+                    (mines if at_bound else safes).update(interior_cells)
+                else:
+                    (mines if at_bound else safes).add(cells[k])
+        return safes, mines
+
+    def interior_cells(self):
+        """
+        Returns the cells not known to be safe or mines that no sentence
+        mentions.
+        """
+        return {
+            (i, j) for i in range(self.width) for j in range(self.height)
+            if (i, j) not in self.mines and (i, j) not in self.safes
+            and (i, j) not in self.cell_index
+        }
+
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -195,83 +726,63 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        print(f"Function called by cell: {cell}")
-        print(f"Number of mines around cell {cell}: {count}")
+        if self.verbose:
+            print(f"Function called by cell: {cell}")
+            print(f"Number of mines around cell {cell}: {count}")
 
-        if not (0 <= cell[0] < self.height and 0 <= cell[1] < self.width):
+        if not (0 <= cell[0] < self.width and 0 <= cell[1] < self.height):
             return
 
         self.moves_made.add(cell)
-        self.safes.add(cell)
+        self.safe_moves.discard(cell)
+        self.last_move = cell
+        self.mark_safe(cell)
 
         # Get neighboring cells
         neighbors = {(cell[0] + i, cell[1] + j) for i in (-1, 0, 1) for j in (-1, 0, 1)
                      if 0 <= cell[0] + i < self.width and 0 <= cell[1] + j < self.height}
 
         neighbors.discard(cell)
+        count -= len(neighbors & self.mines)
+        self.add_sentence(Sentence(neighbors - self.mines - self.safes, count))
 
-        undetermined_cells = [x for x in neighbors if x not in self.mines and x not in self.safes]
-        if undetermined_cells:
-            new_sentence = Sentence(cells=undetermined_cells, count=count)
-            self.knowledge.append(new_sentence)
-
-        previous_safes = set()
-        previous_mines = set()
-        previous_knowledge_length = 0
-
-
-        while True:
-            #Basic Deductions
-            for sentence in self.knowledge:
-                if sentence.count == 0:
-                    safes = set(sentence.cells)
-                    sentence.cells.clear()
-                    for safe in safes:
-                        self.mark_safe(safe)
-
-                elif len(sentence.cells) == sentence.count:
-                    mines = set(sentence.cells)
-                    sentence.cells.clear()
-                    for mine in mines:
-                        self.mark_mine(mine)
+        self.infer()
+        self.solve_linear()
 
-            print(f"Inferred safes: {self.safes - self.moves_made}")
+        if self.verbose:
+            print(f"Inferred safes: {self.safe_moves}")
             print(f"Inferred mines: {self.mines}")
 
-            if (self.safes == previous_safes and self.mines == previous_mines and len(self.knowledge) == previous_knowledge_length):
-                break
-
-                # Update the previous states:
-            previous_safes = self.safes.copy()
-            previous_mines = self.mines.copy()
-            previous_knowledge_length = len(self.knowledge)
-
-
-            #Advanced deductions
-            new_knowledge = set()
-            knowledge_reprs = {(frozenset(sentence.cells), sentence.count) for sentence in self.knowledge}
-
-            for sentenceA in self.knowledge:
-                for sentenceB in self.knowledge:
-                    if sentenceA != sentenceB and sentenceA.cells.issubset(sentenceB.cells):
-                        new_cells = sentenceB.cells - sentenceA.cells
-                        new_count = sentenceB.count - sentenceA.count
-                        new_sentence = Sentence(new_cells, new_count)
-
-                        # hashable representation of the new_sentence
-                        new_sentence_repr = (frozenset(new_sentence.cells), new_sentence.count)
-
-                        # check if this representation is not already in knowledge
-                        if new_sentence_repr not in knowledge_reprs:
-                            knowledge_reprs.add(new_sentence_repr)
-                            new_knowledge.add(new_sentence)
-                            print(f"New knowledge from advanced deduction: {knowledge_reprs}")
-
-            # add the new knowledge (Sentences) to the self.knowledge list
-            self.knowledge.extend(new_knowledge)
-
-            # clean up the knowledge base by removing empty sentences
-            self.knowledge = [s for s in self.knowledge if s.cells and s.count != 0]
+    def add_knowledge_many(self, revealed):
+        """
+        Adds what is known about many revealed cells at once, given as a
+        dictionary from cells to their number of nearby mines, and then
+        draws conclusions from all of it in a single pass.
+        """
+        if self.verbose:
+            print(f"Revealed cells: {revealed}")
+
+        revealed = {cell: count for cell, count in revealed.items()
+                    if 0 <= cell[0] < self.width and 0 <= cell[1] < self.height}
+        for cell in revealed:
+            self.moves_made.add(cell)
+            self.safe_moves.discard(cell)
+            self.last_move = cell
+            self.mark_safe(cell)
+
+        for cell, count in revealed.items():
+            neighbors = {(cell[0] + i, cell[1] + j) for i in (-1, 0, 1) for j in (-1, 0, 1)
+                         if 0 <= cell[0] + i < self.width and 0 <= cell[1] + j < self.height}
+            neighbors.discard(cell)
+            count -= len(neighbors & self.mines)
+            self.add_sentence(Sentence(neighbors - self.mines - self.safes, count))
+
+        self.infer()
+        self.solve_linear()
+
+        if self.verbose:
+            print(f"Inferred safes: {self.safe_moves}")
+            print(f"Inferred mines: {self.mines}")
 
     def make_safe_move(self):
         """
@@ -282,10 +793,190 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for move in self.safes:
-            if move not in self.moves_made:
-                return move
-        return None
+        return next(iter(self.safe_moves), None)
+
+    def frontier_components(self):
+        """
+        Splits the sentences of the knowledge base into groups that
+        share no cells. Returns a list of lists of sentences.
+        """
+        components = []
+        seen = set()
+        for start in self.knowledge:
+            if start in seen:
+                continue
+            seen.add(start)
+            component, frontier = [], [start]
+            while frontier:
+                sentence_id = frontier.pop()
+                sentence = self.knowledge[sentence_id]
+                component.append(sentence)
+                for cell in sentence.cells:
+                    for other_id in self.cell_index[cell]:
+                        if other_id not in seen:
+                            seen.add(other_id)
+                            frontier.append(other_id)
+            components.append(component)
+        return components
+
+    def configuration_key(self, sentences):
+        """
+        Returns the key under which the configurations of a component
+        are cached.
+        """
+        return frozenset((s.origin, s.mask, s.count) for s in sentences)
+
+    def configurations(self, sentences):
+        """
+        Enumerates the mine configurations of a component consistent with
+        its sentences, by backtracking over its cells.
+
+        Returns a pair of dictionaries keyed by the number of mines k:
+        how many configurations have k mines, and for each cell, in how
+        many of those configurations it is a mine. Results are cached,
+        since most components do not change from one move to the next.
+        """
+        key = self.configuration_key(sentences)
+        if key in self.configuration_cache:
+            return self.configuration_cache[key]
+
+        # Order cells so that neighbouring cells are assigned together
+        order = []
+        for sentence in sentences:
+            for cell in sorted(sentence.cells):
+                if cell not in order:
+                    order.append(cell)
+        constraints = {cell: [] for cell in order}
+        for index, sentence in enumerate(sentences):
+            for cell in sentence.cells:
+                constraints[cell].append(index)
+        mines = [0] * len(sentences)
+        unassigned = [len(sentence.cells) for sentence in sentences]
+        assignment = []
+
+        counts = dict()
+        cell_counts = dict()
+
+        def backtrack(position):
+            if position == len(order):
+                k = sum(assignment)
+                counts[k] = counts.get(k, 0) + 1
+                per_cell = cell_counts.setdefault(k, dict())
+                for cell, mine in zip(order, assignment):
+                    if mine:
+                        per_cell[cell] = per_cell.get(cell, 0) + 1
+                return
+            cell = order[position]
+            for mine in (0, 1):
+                for index in constraints[cell]:
+                    mines[index] += mine
+                    unassigned[index] -= 1
+                if all(mines[i] <= sentences[i].count <= mines[i] + unassigned[i]
+                       for i in constraints[cell]):
+                    assignment.append(mine)
+                    backtrack(position + 1)
+                    assignment.pop()
+                for index in constraints[cell]:
+                    mines[index] -= mine
+                    unassigned[index] += 1
+
+        backtrack(0)
+
+        self.configuration_cache[key] = (counts, cell_counts)
+        return counts, cell_counts
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each frontier cell is a mine, given
+        all knowledge, and the probability that any one of the cells not
+        mentioned by the knowledge base is a mine (None if there are none).
+
+        Each frontier component is enumerated on its own. When the total
+        number of mines is known, the components are weighted by how many
+        ways the remaining mines fit into the unconstrained interior;
+        otherwise each unknown cell is assumed to be a mine with prior
+        probability `density`.
+        """
+        frontier = self.frontier_components()
+        components = [self.configurations(sentences) for sentences in frontier]
+
+        # Components that are no longer part of the frontier are retired
+        keys = [self.configuration_key(sentences) for sentences in frontier]
+        self.configuration_cache = {
+            key: self.configuration_cache[key] for key in keys
+        }
+        interior = (self.width * self.height - len(self.mines)
+                    - len(self.safes) - len(self.cell_index))
+        probabilities = dict()
+
+        if self.total_mines is None:
+
+            # Assume every unknown cell is a mine with the same prior odds
+            odds = self.density / (1 - self.density)
+            for counts, cell_counts in components:
+                total = sum(ways * odds ** k for k, ways in counts.items())
+                for k, per_cell in cell_counts.items():
+                    for cell, count in per_cell.items():
+                        probabilities[cell] = (probabilities.get(cell, 0)
+                                               + count * odds ** k / total)
+            for cell in set(self.cell_index) - set(probabilities):
+                probabilities[cell] = 0.0
+            return probabilities, self.density if interior else None
+
+        remaining = self.total_mines - len(self.mines)
+
+        def convolve(a, b):
+            result = dict()
+            for i, x in a.items():
+                for j, y in b.items():
+                    result[i + j] = result.get(i + j, 0) + x * y
+            return result
+
+        # Ways to place the mines left over by k frontier mines, as logs,
+        # since the counts themselves get enormous on large boards
+        logs = dict()
+        for k in range(len(self.cell_index) + 1):
+            left = remaining - k
+            if 0 <= left <= interior:
+                logs[k] = (math.lgamma(interior + 1) - math.lgamma(left + 1)
+                           - math.lgamma(interior - left + 1))
+        if not logs:
+            return dict(), None
+        largest = max(logs.values())
+
+        def interior_ways(k):
+            """Ways to place the mines left over by k frontier mines, scaled."""
+            if k in logs:
+                return math.exp(logs[k] - largest)
+            return 0
+
+        # Mine count distributions of all components before and after each one
+        prefixes = [{0: 1}]
+        for counts, _ in components:
+            prefixes.append(convolve(prefixes[-1], counts))
+        suffixes = [{0: 1}]
+        for counts, _ in reversed(components):
+            suffixes.append(convolve(suffixes[-1], counts))
+        suffixes.reverse()
+
+        total = sum(ways * interior_ways(k) for k, ways in prefixes[-1].items())
+        if total == 0:
+            return dict(), None
+
+        for index, (counts, cell_counts) in enumerate(components):
+            others = convolve(prefixes[index], suffixes[index + 1])
+            for k, per_cell in cell_counts.items():
+                weight = sum(ways * interior_ways(k + j) for j, ways in others.items())
+                for cell, count in per_cell.items():
+                    probabilities[cell] = probabilities.get(cell, 0) + count * weight
+        for cell in set(self.cell_index):
+            probabilities[cell] = probabilities.get(cell, 0) / total
+
+        if not interior:
+            return probabilities, None
+        expected = sum(ways * interior_ways(k) * (remaining - k)
+                       for k, ways in prefixes[-1].items())
+        return probabilities, expected / total / interior
 
     def make_random_move(self):
         """
@@ -293,13 +984,35 @@ class MinesweeperAI(): #handles inferring which moves to make based on knowledge
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        Among those, the cells least likely to be a mine are preferred.
+        """
+        probabilities, interior = self.mine_probabilities()
+        if probabilities:
+            lowest = min(probabilities.values())
+            if interior is None or lowest <= interior:
+                best_moves = [cell for cell, p in probabilities.items()
+                              if p <= lowest + 1e-12]
+                return random.choice(best_moves)
+        if interior is None:
+            return None
+        return self.random_interior_cell()
+
+    def random_interior_cell(self):
+        """
+        Returns a random cell that is not known to be safe or a mine and
+        is not mentioned by the knowledge base, or None.
         """
-        # all possible moves on the board
-        all_possible_moves = [(i, j) for i in range(self.width) for j in range(self.height)]
 
-        available_moves = [move for move in all_possible_moves if move not in self.moves_made and move not in self.mines]
+        # Sampling is quick while such cells are a fair share of the board
+        for _ in range(100):
+            cell = (random.randrange(self.width), random.randrange(self.height))
+            if (cell not in self.mines and cell not in self.safes
+                    and cell not in self.cell_index):
+                return cell
 
+        available_moves = list(self.interior_cells())
         if not available_moves:
             return None
 
-        return random.choice(available_moves)
\ No newline at end of file
+        return random.choice(available_moves)
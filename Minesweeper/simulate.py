@@ -0,0 +1,139 @@
+import argparse
+import multiprocessing
+import random
+import statistics
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI, SparseMinesweeper
+
+# Points of a game, as fractions of its moves, at which knowledge size is reported
+PROGRESS = [0.1, 0.25, 0.5, 0.75, 1.0]
+
+
+def play(seed, height, width, mines, sparse=False, chunk_size=None,
+         max_moves=None):
+    """
+    Plays one game with the AI and no display, seeded by `seed`.
+    Returns whether it was won, the number of moves and guesses,
+    the inference time of each move and the knowledge base size
+    after each move.
+
+    With `sparse` or `chunk_size`, the game is a `SparseMinesweeper`;
+    on a chunked board the AI only knows the mine density.
+    """
+    random.seed(seed)
+    if chunk_size is not None:
+        game = SparseMinesweeper(height=height, width=width, mines=mines,
+                                 chunk_size=chunk_size, seed=seed)
+        ai = MinesweeperAI(height=height, width=width, density=game.density)
+    elif sparse:
+        game = SparseMinesweeper(height=height, width=width, mines=mines,
+                                 seed=seed)
+        ai = MinesweeperAI(height=height, width=width, mines=mines)
+    else:
+        game = Minesweeper(height=height, width=width, mines=mines)
+        ai = MinesweeperAI(height=height, width=width, mines=mines)
+    if chunk_size is not None:
+        mines = game.total_mines
+    safe_cells = height * width - mines
+
+    guesses = 0
+    times = []
+    sizes = []
+    revealed = set()
+    while len(revealed) < safe_cells:
+        if max_moves is not None and len(times) >= max_moves:
+            break
+        # Only the AI's own calls are timed, not the game's reveal
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            guesses += 1
+            move = ai.make_random_move()
+        elapsed = time.perf_counter() - start
+        if move is None or game.is_mine(move):
+            break
+        region = game.reveal(move)
+        start = time.perf_counter()
+        ai.add_knowledge_many(region)
+        times.append(elapsed + time.perf_counter() - start)
+        sizes.append(len(ai.knowledge))
+        revealed.update(region)
+
+    return {
+        "won": len(revealed) == safe_cells,
+        "moves": len(times),
+        "guesses": guesses,
+        "times": times,
+        "sizes": sizes
+    }
+
+
+def play_game(args):
+    """Process pool entry point for `play`."""
+    return play(*args)
+
+
+def simulate(games, height, width, mines, seed=0, processes=None,
+             sparse=False, chunk_size=None, max_moves=None):
+    """
+    Plays `games` games on a process pool, with seeds `seed`,
+    `seed + 1` and so on, and returns their results in seed order.
+    """
+    jobs = [(seed + n, height, width, mines, sparse, chunk_size, max_moves)
+            for n in range(games)]
+    if processes == 1:
+        return [play_game(job) for job in jobs]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.map(play_game, jobs)
+
+
+def report(results):
+    """Prints win rate, moves, inference time and knowledge size."""
+    games = len(results)
+    wins = sum(result["won"] for result in results)
+    times = [t for result in results for t in result["times"]]
+    print(f"Games:            {games}")
+    print(f"Win rate:         {wins / games:.1%}")
+    print(f"Moves per game:   {statistics.mean(r['moves'] for r in results):.1f}")
+    print(f"Guesses per game: {statistics.mean(r['guesses'] for r in results):.2f}")
+    if times:
+        times.sort()
+        print(f"AI time per move: mean {statistics.mean(times) * 1000:.3f} ms, "
+              f"p99 {times[int(0.99 * (len(times) - 1))] * 1000:.3f} ms")
+
+    print("Knowledge base size over a game:")
+    for fraction in PROGRESS:
+        sizes = [r["sizes"][max(0, round(fraction * len(r["sizes"])) - 1)]
+                 for r in results if r["sizes"]]
+        if sizes:
+            print(f"  {fraction:>5.0%} of moves: mean {statistics.mean(sizes):.1f}, "
+                  f"max {max(sizes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play Minesweeper games with the AI, without a display."
+    )
+    parser.add_argument("-n", "--games", type=int, default=100)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--sparse", action="store_true",
+                        help="store only the mines instead of full grids")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="generate the board lazily in chunks")
+    parser.add_argument("--max-moves", type=int, default=None)
+    args = parser.parse_args()
+
+    results = simulate(args.games, args.height, args.width, args.mines,
+                       seed=args.seed, processes=args.processes,
+                       sparse=args.sparse, chunk_size=args.chunk_size,
+                       max_moves=args.max_moves)
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import stats
+
+from pagerank import *
+
+# Graph sizes to benchmark, as numbers of pages
+SIZES = [100, 1000, 10000, 100000]
+
+# Links from each page that has any
+LINKS = 4
+
+# Share of pages without links
+DANGLING = 0.3
+
+# Numbers of samples the sampling engine is run with
+SAMPLE_COUNTS = [10000, 100000, 1000000, 10000000]
+
+# Tolerance of the reference ranks every engine is compared to
+REFERENCE_TOLERANCE = 1e-14
+
+# Number of highest ranked pages whose order is compared
+TOP = 100
+
+# Corpora every solver must agree with power iteration on, and the
+# largest L1 distance allowed between their ranks
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+AGREEMENT = 1e-8
+
+
+def generate_graph(n, links=LINKS, dangling=DANGLING, seed=None):
+    """
+    Return a corpus of `n` pages built by preferential attachment: each
+    new page links to `links` earlier pages, picked with probability
+    growing with the number of links they already receive, except for
+    a `dangling` share of pages that link nowhere.
+    """
+    rng = random.Random(seed)
+    corpus = {"0.html": set()}
+
+    # Each page appears once, plus once for every link to it
+    targets = ["0.html"]
+    for i in range(1, n):
+        page = f"{i}.html"
+        if rng.random() < dangling:
+            corpus[page] = set()
+        else:
+            corpus[page] = {rng.choice(targets) for _ in range(links)}
+            targets.extend(corpus[page])
+        targets.append(page)
+    return corpus
+
+
+def sampling(samples):
+    """Returns an engine sampling `samples` pages with random surfers."""
+    def engine(offsets, links):
+        rng = np.random.default_rng(0)
+        counts = surf(offsets, links, DAMPING, samples, min(WALKERS, samples), rng)
+        return counts / samples
+    return engine
+
+
+def solver(method):
+    """Returns an engine iterating with the solver named `method`."""
+    def engine(offsets, links):
+        matrix, dangling = transition_matrix(offsets, links)
+        ranks, _ = SOLVERS[method](matrix, dangling, DAMPING)
+        return ranks
+    return engine
+
+
+def streaming(offsets, links):
+    """Ranks pages with `stream_pagerank`, saving their links first."""
+    sources = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    with tempfile.TemporaryDirectory() as directory:
+        save_edges(directory, np.arange(len(offsets) - 1), sources, links)
+        ranks, _ = stream_pagerank(directory, DAMPING)
+    return ranks
+
+
+ENGINES = [
+    *((f"sample {samples:.0e}", sampling(samples)) for samples in SAMPLE_COUNTS),
+    *((method, solver(method)) for method in SOLVERS),
+    ("stream", streaming)
+]
+
+
+def measure(engine, offsets, links):
+    """
+    Runs an engine over interned links, returning its ranks, wall time
+    in seconds and peak memory in MiB.
+
+    Tracing allocations slows the Python parts of an engine down but not
+    its NumPy kernels, so the engine is timed in one run and its memory
+    traced in another.
+    """
+    start = time.perf_counter()
+    ranks = engine(offsets, links)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    engine(offsets, links)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ranks, elapsed, peak / 2 ** 20
+
+
+def errors(ranks, reference):
+    """
+    Returns the L1 distance between two rank vectors, and the Kendall
+    tau distance between their orders of the TOP pages of `reference`,
+    the share of pairs of those pages they put in different orders.
+    """
+    top = np.argsort(-reference)[:TOP]
+    tau = stats.kendalltau(ranks[top], reference[top]).statistic
+    return np.abs(ranks - reference).sum(), (1 - tau) / 2
+
+
+def check_solvers():
+    """
+    Checks every solver agrees with power iteration on the CORPORA.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    for name in CORPORA:
+        corpus = crawl(os.path.join(folder, name), processes=1)
+        reference, _ = solve_pagerank(corpus, DAMPING, "power",
+                                      tolerance=REFERENCE_TOLERANCE)
+        for method in SOLVERS:
+            ranks, _ = solve_pagerank(corpus, DAMPING, method,
+                                      tolerance=REFERENCE_TOLERANCE)
+            distance = sum(abs(ranks[page] - reference[page]) for page in corpus)
+            if distance > AGREEMENT:
+                raise Exception(f"{method} is {distance:.2e} away from power on {name}")
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [max_pages]")
+    largest = int(sys.argv[1]) if len(sys.argv) == 2 else max(SIZES)
+    check_solvers()
+
+    print(f"{'pages':>7} {'engine':>14} {'time (s)':>10} "
+          f"{'memory (MiB)':>13} {'L1 error':>10} {'tau error':>10}")
+    for n in SIZES:
+        if n > largest:
+            break
+        corpus = generate_graph(n, seed=n)
+        _, offsets, links = link_lists(corpus)
+        matrix, dangling = transition_matrix(offsets, links)
+        reference, _ = power_iteration(matrix, dangling, DAMPING,
+                                       tolerance=REFERENCE_TOLERANCE)
+        for name, engine in ENGINES:
+            ranks, elapsed, memory = measure(engine, offsets, links)
+            l1, tau = errors(ranks, reference)
+            print(f"{n:>7} {name:>14} {elapsed:>10.4f} "
+                  f"{memory:>13.1f} {l1:>10.2e} {tau:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
+import collections
 import csv
+import heapq
 import itertools
 import sys
 
+import numpy as np
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,15 +40,38 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Number of assignments enumerated at a time in batches
+BLOCK = 65536
+
 # The AI will calculate the probability distribution over how many of copies of the gene
 # they have, as well as whether they have the trait or not.
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python heredity.py data.csv [enumerate|batch|eliminate]")
+    method = sys.argv[2] if len(sys.argv) == 3 else "eliminate"
+    if method not in METHODS:
+        sys.exit(f"Unknown method {method}, expected one of {', '.join(METHODS)}")
     people = load_data(sys.argv[1])
+    probabilities = METHODS[method](people)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people):
+    """
+    Return the gene and trait distributions of each person in `people`,
+    by enumerating every assignment of genes and traits.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -62,38 +89,32 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Loop over every assignment consistent with known information,
+    # summing joint probabilities by bitmask
+    one_gene_totals = collections.defaultdict(float)
+    two_genes_totals = collections.defaultdict(float)
+    have_trait_totals = collections.defaultdict(float)
+    for one_gene, two_genes, have_trait, p in assignments(people):
+        one_gene_totals[one_gene] += p
+        two_genes_totals[two_genes] += p
+        have_trait_totals[have_trait] += p
+
+    # Update probabilities with the joint probabilities of each bitmask
+    names = topological_order(people)
+    total = sum(have_trait_totals.values())
+    for i, person in enumerate(names):
+        one_gene = sum(p for mask, p in one_gene_totals.items() if mask >> i & 1)
+        two_genes = sum(p for mask, p in two_genes_totals.items() if mask >> i & 1)
+        have_trait = sum(p for mask, p in have_trait_totals.items() if mask >> i & 1)
+        probabilities[person]["gene"][1] += one_gene
+        probabilities[person]["gene"][2] += two_genes
+        probabilities[person]["gene"][0] += total - one_gene - two_genes
+        probabilities[person]["trait"][True] += have_trait
+        probabilities[person]["trait"][False] += total - have_trait
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -118,6 +139,89 @@ def load_data(filename):
     return data
 
 
+def topological_order(people):
+    """
+    Return the names of `people` ordered so that parents come before
+    their children.
+    """
+    order = []
+    placed = set()
+
+    def place(person):
+        if person is None or person in placed:
+            return
+        placed.add(person)
+        place(people[person]["mother"])
+        place(people[person]["father"])
+        order.append(person)
+
+    for person in people:
+        place(person)
+    return order
+
+
+def assignments(people, cutoff=0):
+    """
+    Yield every assignment of genes and traits to `people` that agrees
+    with the known traits, as tuples (one_gene, two_genes, have_trait, p)
+    where the first three are bitmasks over `topological_order(people)`
+    and `p` is the joint probability of the assignment.
+
+    People are assigned in topological order, so that the probability
+    can be built up one person at a time, and branches whose probability
+    falls to `cutoff` or below are dropped without being explored.
+    """
+    names = topological_order(people)
+    index = {name: i for i, name in enumerate(names)}
+    parents = [
+        None if people[name]["mother"] is None else
+        (index[people[name]["mother"]], index[people[name]["father"]])
+        for name in names
+    ]
+    traits = [
+        [True, False] if people[name]["trait"] is None else [people[name]["trait"]]
+        for name in names
+    ]
+    mutation = PROBS["mutation"]
+
+    # Probability that a parent passes the gene on, by gene count
+    passes = [mutation, 0.5, 1 - mutation]
+
+    stack = [(0, 0, 0, 0, 1)]
+    while stack:
+        i, one_gene, two_genes, have_trait, p = stack.pop()
+        if i == len(names):
+            yield one_gene, two_genes, have_trait, p
+            continue
+
+        if parents[i] is None:
+            gene_probs = [PROBS["gene"][genes] for genes in range(3)]
+        else:
+            mother, father = (
+                2 if two_genes >> j & 1 else 1 if one_gene >> j & 1 else 0
+                for j in parents[i]
+            )
+            mother_prob, father_prob = passes[mother], passes[father]
+            gene_probs = [
+                (1 - mother_prob) * (1 - father_prob),
+                mother_prob * (1 - father_prob) + (1 - mother_prob) * father_prob,
+                mother_prob * father_prob
+            ]
+
+        bit = 1 << i
+        for genes in range(3):
+            for trait in traits[i]:
+                q = p * gene_probs[genes] * PROBS["trait"][genes][trait]
+                if q > cutoff:
+                    stack.append((
+                        i + 1,
+                        one_gene | bit if genes == 1 else one_gene,
+                        two_genes | bit if genes == 2 else two_genes,
+                        have_trait | bit if trait else have_trait,
+                        q
+                    ))
+
+
 def powerset(s):
     """
     Return a list of all possible subsets of set s.
@@ -150,7 +254,7 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         trait = person in have_trait
 
         #genes
-        if 'mother' in people[person] and 'father' in people[person]:
+        if people[person]['mother'] is not None and people[person]['father'] is not None:
             mother = people[person]['mother']
             father = people[person]['father']
 
@@ -224,5 +328,290 @@ def normalize(probabilities):
             data['trait'][trait] /= trait_sum
 
 
+
+def inheritance_table():
+    """
+    Return an array whose entry (child, mother, father) is the
+    probability of a child having `child` copies of the gene given that
+    its parents have `mother` and `father` copies.
+    """
+    mutation = PROBS["mutation"]
+
+    # Probability that a parent with 0, 1 or 2 copies passes the gene on
+    passes = np.array([mutation, 0.5, 1 - mutation])
+
+    return np.stack([
+        np.outer(1 - passes, 1 - passes),
+        np.outer(passes, 1 - passes) + np.outer(1 - passes, passes),
+        np.outer(passes, passes)
+    ])
+
+
+def person_probabilities(people, names, genes):
+    """
+    Return a tuple (gene_probs, trait_probs) for a batch of gene
+    assignments, where row k of the integer array `genes` gives the gene
+    count of each person in `names` in assignment k. `gene_probs` holds
+    the probability of each person's gene count given their parents',
+    and `trait_probs` that of each trait given their gene count, with
+    one last axis for False and True.
+    """
+    index = {name: i for i, name in enumerate(names)}
+    founders = np.array([people[name]["mother"] is None for name in names])
+    mothers = np.array([index.get(people[name]["mother"], i) for i, name in enumerate(names)])
+    fathers = np.array([index.get(people[name]["father"], i) for i, name in enumerate(names)])
+
+    # Look up every person's probabilities in the whole batch at once
+    prior = np.array([PROBS["gene"][g] for g in range(3)])
+    trait = np.array([[PROBS["trait"][g][t] for t in [False, True]] for g in range(3)])
+    inherited = inheritance_table()[genes, genes[:, mothers], genes[:, fathers]]
+    gene_probs = np.where(founders, prior[genes], inherited)
+    return gene_probs, trait[genes]
+
+
+def joint_probabilities(people, names, genes, traits):
+    """
+    Compute and return the joint probabilities of a batch of assignments,
+    as `joint_probability` does for one, where row k of the integer array
+    `genes` and the boolean array `traits` give the gene count and trait
+    of each person in `names` in assignment k.
+    """
+    gene_probs, trait_probs = person_probabilities(people, names, genes)
+    trait_probs = np.take_along_axis(trait_probs, traits.astype(np.intp)[..., None], axis=2)
+    return (gene_probs * trait_probs[..., 0]).prod(axis=1)
+
+
+def update_batch(gene_totals, trait_totals, genes, trait_probs, p):
+    """
+    Add to the arrays `gene_totals` and `trait_totals`, with one row per
+    person and one column per gene count or trait, the probabilities `p`
+    of a batch of gene assignments, split between traits in proportion
+    to `trait_probs` as from `person_probabilities`.
+    """
+    people = np.arange(genes.shape[1])
+    weights = np.broadcast_to(p[:, None], genes.shape).ravel()
+    gene_totals += np.bincount(
+        (people * 3 + genes).ravel(), weights=weights, minlength=gene_totals.size
+    ).reshape(gene_totals.shape)
+    trait_totals += np.einsum(
+        "k,knt->nt", p, trait_probs / trait_probs.sum(axis=2, keepdims=True)
+    )
+
+
+def batch_probabilities(people, block=BLOCK):
+    """
+    Return the gene and trait distributions of each person in `people`,
+    by enumerating every assignment of genes, `block` assignments at a
+    time as NumPy arrays. Each person's trait only depends on their own
+    gene count, so rather than enumerating unknown traits too, both
+    values are weighed at once in every assignment.
+    """
+    names = list(people)
+    n = len(names)
+
+    # Known traits can only take their known value
+    allowed = np.array([
+        [people[name]["trait"] is not True, people[name]["trait"] is not False]
+        for name in names
+    ])
+
+    # Assignments are numbered, and their number read as one base 3
+    # digit for the gene count of each person
+    places = 3 ** np.arange(n)
+    count = 3 ** n
+
+    gene_totals = np.zeros((n, 3))
+    trait_totals = np.zeros((n, 2))
+    for start in range(0, count, block):
+        numbers = np.arange(start, min(start + block, count), dtype=np.int64)
+        genes = (numbers[:, None] // places) % 3
+
+        # Probabilities of each assignment, over both values of unknown traits
+        gene_probs, trait_probs = person_probabilities(people, names, genes)
+        trait_probs = trait_probs * allowed
+        p = (gene_probs * trait_probs.sum(axis=2)).prod(axis=1)
+        update_batch(gene_totals, trait_totals, genes, trait_probs, p)
+
+    # Ensure probabilities sum to 1
+    gene_totals /= gene_totals.sum(axis=1, keepdims=True)
+    trait_totals /= trait_totals.sum(axis=1, keepdims=True)
+    return {
+        name: {
+            "gene": {g: float(gene_totals[i, g]) for g in [2, 1, 0]},
+            "trait": {True: float(trait_totals[i, 1]), False: float(trait_totals[i, 0])}
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def gene_factors(people):
+    """
+    Return the factors of the Bayesian network over how many copies of
+    the gene each person has, as (scope, table) pairs where `table` has
+    one axis for the gene count of each person in `scope`. Observed
+    traits are included as evidence on the gene count of their person.
+    """
+    inheritance = inheritance_table()
+    factors = []
+    for person, data in people.items():
+        if data["mother"] is None:
+            factors.append(((person,), np.array([PROBS["gene"][g] for g in range(3)])))
+        else:
+            factors.append(((person, data["mother"], data["father"]), inheritance))
+        if data["trait"] is not None:
+            factors.append(((person,), np.array(
+                [PROBS["trait"][g][data["trait"]] for g in range(3)]
+            )))
+    return factors
+
+
+def contract(factors, scope):
+    """
+    Return the product of `factors`, summed over every person not in
+    `scope`, as a table with one axis per person in `scope`, scaled to
+    sum to 1.
+    """
+    labels = {person: i for i, person in enumerate(
+        dict.fromkeys(itertools.chain(scope, *(s for s, _ in factors)))
+    )}
+
+    # People not in any factor contribute nothing but their axis
+    operands = []
+    for person in set(scope) - {p for s, _ in factors for p in s}:
+        operands += [np.ones(3), [labels[person]]]
+    for factor_scope, table in factors:
+        operands += [table, [labels[person] for person in factor_scope]]
+
+    table = np.einsum(*operands, [labels[person] for person in scope])
+    return table / table.sum()
+
+
+def elimination_tree(people, factors):
+    """
+    Return a tuple (order, cliques, parents) describing the junction
+    tree made by eliminating people one by one, each time picking the
+    one whose elimination adds the fewest new edges to the moral graph.
+    `cliques` maps each person to the clique formed when eliminating
+    them, starting with themselves, and `parents` maps each person to the
+    person whose clique receives their message, or None.
+    """
+    neighbors = {person: set() for person in people}
+    for scope, _ in factors:
+        for person in scope:
+            neighbors[person].update(scope)
+    for person in neighbors:
+        neighbors[person].discard(person)
+
+    def score(person):
+        """Number of edges eliminating `person` would add, then its degree."""
+        adjacent = list(neighbors[person])
+        fill = sum(b not in neighbors[a] for a, b in itertools.combinations(adjacent, 2))
+        return (fill, len(adjacent), person)
+
+    # Scores are kept in a heap, where entries left behind by a rescore
+    # or an elimination are skipped when popped
+    scores = {person: score(person) for person in people}
+    heap = list(scores.values())
+    heapq.heapify(heap)
+
+    order = []
+    cliques = dict()
+    while heap:
+        entry = heapq.heappop(heap)
+        person = entry[-1]
+        if scores.get(person) != entry:
+            continue
+        del scores[person]
+        order.append(person)
+        cliques[person] = (person, *sorted(neighbors[person]))
+
+        # Neighbors of an eliminated person become neighbors of each other
+        stale = set(neighbors[person])
+        for a, b in itertools.combinations(neighbors[person], 2):
+            if b not in neighbors[a]:
+                neighbors[a].add(b)
+                neighbors[b].add(a)
+
+                # A new edge is no longer fill for anyone adjacent to both ends
+                stale.update(neighbors[a] & neighbors[b])
+        for other in neighbors[person]:
+            neighbors[other].discard(person)
+
+        # Only people whose neighborhood changed are rescored
+        stale.discard(person)
+        for other in stale:
+            scores[other] = score(other)
+            heapq.heappush(heap, scores[other])
+
+    position = {person: i for i, person in enumerate(order)}
+    parents = {
+        person: min(cliques[person][1:], key=position.get, default=None)
+        for person in order
+    }
+    return order, cliques, parents
+
+
+def eliminate(people):
+    """
+    Return the gene and trait distributions of each person in `people`,
+    as `enumerate_probabilities` does, but by passing messages in a
+    junction tree over gene counts. This takes time polynomial in the
+    size of the family as long as its cliques stay small, as they do
+    for tree-like pedigrees.
+    """
+    factors = gene_factors(people)
+    order, cliques, parents = elimination_tree(people, factors)
+    position = {person: i for i, person in enumerate(order)}
+
+    # Each factor belongs to the clique of the first of its people to be eliminated
+    assigned = {person: [] for person in order}
+    for factor in factors:
+        assigned[min(factor[0], key=position.get)].append(factor)
+    children = {person: [] for person in order}
+    for person in order:
+        if parents[person] is not None:
+            children[parents[person]].append(person)
+
+    # Pass messages from the leaves of the tree up to its roots
+    up = dict()
+    for person in order:
+        incoming = [up[child] for child in children[person]]
+        up[person] = (cliques[person][1:],
+                      contract(assigned[person] + incoming, cliques[person][1:]))
+
+    # Pass messages back down, and read off each person's gene distribution
+    down = dict()
+    genes = dict()
+    for person in reversed(order):
+        incoming = assigned[person] + ([down[person]] if person in down else [])
+        for child in children[person]:
+            others = [up[other] for other in children[person] if other != child]
+            down[child] = (cliques[child][1:],
+                           contract(incoming + others, cliques[child][1:]))
+        genes[person] = contract(incoming + [up[child] for child in children[person]],
+                                 (person,))
+
+    probabilities = dict()
+    for person in people:
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = sum(genes[person][g] * PROBS["trait"][g][True] for g in range(3))
+        else:
+            has_trait = float(trait)
+        probabilities[person] = {
+            "gene": {g: float(genes[person][g]) for g in [2, 1, 0]},
+            "trait": {True: float(has_trait), False: float(1 - has_trait)}
+        }
+    return probabilities
+
+
+# Ways to compute the distributions, by name
+METHODS = {
+    "enumerate": enumerate_probabilities,
+    "batch": batch_probabilities,
+    "eliminate": eliminate
+}
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,16 +1,69 @@
+import functools
+import multiprocessing
 import os
-import random
-import re
+import posixpath
 import sys
+from collections import deque
+from html.parser import HTMLParser
+from urllib.parse import unquote, urldefrag, urlsplit
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve_triangular
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Number of random surfers sampled side by side
+WALKERS = 10000
+
+# Number of steps surfers take before their samples are recorded
+BURN_IN = 50
+
+# Number of samples recorded before they are tallied
+BLOCK = 1000000
+
+# Change in ranks between two iterations below which they have converged
+TOLERANCE = 0.001
+
+# Number of iterations between two extrapolations of the ranks
+EXTRAPOLATE = 10
+
+# Share of the pages that must have converged before adaptive iteration
+# stops recomputing them
+FREEZE = 0.1
+
+# Iterations adaptive iteration runs before freezing any page, and number
+# of iterations in a row a page must have converged for to be frozen
+WARMUP = 3
+SETTLED = 3
+
+# Number of walks started from each page for personalized PageRank
+WALKS = 64
+
+# Residual left on a page per link, below which personalized PageRank
+# stops pushing it to the pages linked to
+EPSILON = 1e-4
+
+# Number of links read at a time from memory-mapped link graphs
+EDGE_BLOCK = 1 << 22
+
+# Number of characters of a page read at a time when crawling
+CHUNK = 65536
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python pagerank.py corpus [links.npz]")
+
+    # A corpus is either crawled, or loaded from a link graph saved before
+    if os.path.isdir(sys.argv[1]):
+        corpus = crawl(sys.argv[1])
+    else:
+        corpus = load_corpus(sys.argv[1])
+    if len(sys.argv) == 3:
+        save_corpus(corpus, sys.argv[2])
+
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -21,22 +74,25 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, processes=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    Pages are parsed on a pool of `processes` processes, or in this
+    process if `processes` is 1.
     """
-    pages = dict()
+    filenames = [filename for filename in os.listdir(directory)
+                 if filename.endswith(".html")]
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    parse = functools.partial(page_links, directory)
+    if processes == 1:
+        pages = dict(map(parse, filenames))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            pages = dict(pool.imap_unordered(parse, filenames, chunksize=64))
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -48,6 +104,85 @@ def crawl(directory):
     return pages
 
 
+class LinkParser(HTMLParser):
+    """
+    HTML parser collecting the targets of the links in a page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links = set()
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value:
+                    self.links.add(value)
+
+
+def page_links(directory, filename):
+    """
+    Return a tuple (filename, links) with the set of pages linked to
+    by the page `filename` in `directory`, other than itself.
+    """
+    parser = LinkParser()
+    with open(os.path.join(directory, filename), errors="replace") as f:
+        while chunk := f.read(CHUNK):
+            parser.feed(chunk)
+    parser.close()
+
+    links = set()
+    folder = posixpath.dirname(filename)
+    for link in parser.links:
+        link = normalize_link(folder, link)
+        if link is not None and link != filename:
+            links.add(link)
+    return filename, links
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_link(folder, link):
+    """
+    Return the path, relative to the corpus directory, of the page that
+    `link` on a page in `folder` refers to, or None if it leads to
+    another site or back to the same page.
+    """
+    url, _ = urldefrag(link.strip())
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        path = posixpath.join(folder, path)
+    return posixpath.normpath(path).lstrip("/")
+
+
+def save_corpus(corpus, path):
+    """
+    Save the link graph of `corpus` to the NumPy archive `path`,
+    as the list of page names and the edges between their indices.
+    """
+    pages, offsets, links = link_lists(corpus)
+    sources = np.repeat(np.arange(len(pages), dtype=np.int32), np.diff(offsets))
+    np.savez(path, pages=np.array(pages, dtype=str),
+             sources=sources, destinations=links.astype(np.int32))
+
+
+def load_corpus(path):
+    """
+    Load a corpus saved by `save_corpus` from `path`.
+    """
+    with np.load(path) as data:
+        pages = data["pages"].tolist()
+        sources = data["sources"]
+        destinations = data["destinations"]
+
+    corpus = {page: set() for page in pages}
+    for source, destination in zip(sources.tolist(), destinations.tolist()):
+        corpus[pages[source]].add(pages[destination])
+    return corpus
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -82,7 +217,7 @@ def transition_model(corpus, page, damping_factor):
     return prob_distribution
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=WALKERS, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -90,31 +225,269 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The samples are taken by up to `walkers` surfers moving at once,
+    each starting on a page at random.
     """
-    samples_count = {page: 0 for page in corpus.keys()} # sets the count of visits for each page
-    current_sample = random.choice(list(corpus.keys()))
-    samples_count[current_sample] += 1
+    pages, offsets, links = link_lists(corpus)
+    rng = np.random.default_rng(seed)
+    counts = surf(offsets, links, damping_factor, n, min(walkers, n), rng)
+    return dict(zip(pages, (counts / n).tolist()))
 
-    for i in range(n-1):
-        # transition probabilities
-        probs = transition_model(corpus, current_sample, damping_factor)
 
-        # choose next sample
-        current_sample = random.choices(
-            population=list(probs.keys()),
-            weights=list(probs.values()),
-            k=1 #how many items we want to choose
-        )[0] #access first and only item
+def surf(offsets, links, damping_factor, n, walkers, rng):
+    """
+    Return how many of `n` samples land on each page, when `walkers`
+    random surfers move at once over the links from `link_lists`.
 
-        samples_count[current_sample] += 1
+    Each step costs the same whatever the size of the corpus: a coin
+    with bias `damping_factor` decides whether a surfer follows a link,
+    picked by its position among the page's links, or jumps to any page.
+    """
+    N = len(offsets) - 1
+    degrees = np.diff(offsets)
+
+    def step(current):
+        # Surfers on pages with links follow one with probability `damping_factor`
+        follow = rng.random(walkers) < damping_factor
+        follow &= degrees[current] > 0
+        following = current[follow]
+        choice = (rng.random(len(following)) * degrees[following]).astype(np.int64)
+
+        # Other surfers jump to a page chosen at random
+        current = rng.integers(0, N, walkers)
+        current[follow] = links[offsets[following] + choice]
+        return current
+
+    # Surfers walk for a while first, so their random start fades out
+    current = rng.integers(0, N, walkers)
+    for _ in range(BURN_IN):
+        current = step(current)
+
+    # Samples are recorded in blocks, then tallied all at once
+    counts = np.zeros(N, dtype=np.int64)
+    visits = np.empty((max(1, BLOCK // walkers), walkers), dtype=np.int64)
+    taken = 0
+    while taken < n:
+        rounds = min(len(visits), -(-(n - taken) // walkers))
+        for r in range(rounds):
+            visits[r] = current
+            current = step(current)
+
+        recorded = visits[:rounds].ravel()[:n - taken]
+        counts += np.bincount(recorded, minlength=N)
+        taken += len(recorded)
+
+    return counts
+
+
+def link_lists(corpus):
+    """
+    Intern the pages of `corpus` to indices and return a tuple
+    (pages, offsets, links), where `pages` lists the page names by
+    index and page i links to the pages `links[offsets[i]:offsets[i + 1]]`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
 
-    total_samples = sum(samples_count.values())
-    pagerank = {page: count/total_samples for page, count in samples_count.items()}
+    # Links to pages outside the corpus are ignored
+    targets = [[index[link] for link in corpus[page] if link in index]
+               for page in pages]
+    offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+    np.cumsum([len(links) for links in targets], out=offsets[1:])
+    links = np.fromiter(
+        (i for links in targets for i in links), dtype=np.int64, count=offsets[-1]
+    )
+    return pages, offsets, links
 
-    return pagerank
 
+def link_matrix(corpus):
+    """
+    Intern the pages of `corpus` to indices and return a tuple
+    (pages, matrix, dangling), where `pages` lists the page names by
+    index, `matrix` is a sparse CSR matrix whose entry (i, j) is the
+    probability of following a link from page j to page i, and
+    `dangling` is a boolean array marking pages without links.
+    """
+    pages, offsets, links = link_lists(corpus)
+    return (pages, *transition_matrix(offsets, links))
 
-def iterate_pagerank(corpus, damping_factor):
+
+def transition_matrix(offsets, links):
+    """
+    Return a tuple (matrix, dangling) as in `link_matrix`, from the
+    offsets and links from `link_lists`.
+    """
+    N = len(offsets) - 1
+    degrees = np.diff(offsets)
+    sources = np.repeat(np.arange(N), degrees)
+
+    matrix = sparse.csr_matrix(
+        (1 / degrees[sources], (links, sources)), shape=(N, N)
+    )
+    return matrix, degrees == 0
+
+
+def power_iteration(matrix, dangling, damping_factor, tolerance=TOLERANCE, norm=1,
+                    ranks=None, extrapolate=None):
+    """
+    Return a tuple (ranks, history) with the PageRank vector of the
+    link matrix and dangling pages from `link_matrix`, iterating from
+    `ranks` (uniform by default) until the `norm` of the change in ranks
+    between two iterations is at most `tolerance`. `history` lists that
+    change after each iteration.
+
+    Pages without links are treated as linking to every page, by
+    spreading their rank evenly rather than adding links to them.
+
+    With `extrapolate`, a function such as `aitken` or `quadratic`, the
+    ranks are extrapolated from the last iterates every EXTRAPOLATE
+    iterations.
+    """
+    N = matrix.shape[0]
+    if ranks is None:
+        ranks = np.full(N, 1 / N)
+
+    history = []
+    iterates = deque(maxlen=4)
+    while True:
+        spread = (1 - damping_factor + damping_factor * ranks[dangling].sum()) / N
+        new_ranks = damping_factor * (matrix @ ranks) + spread
+        history.append(np.linalg.norm(new_ranks - ranks, ord=norm))
+        ranks = new_ranks
+        if history[-1] <= tolerance:
+            return ranks, history
+
+        if extrapolate is not None:
+            iterates.append(ranks)
+            if len(history) % EXTRAPOLATE == 0 and len(iterates) == iterates.maxlen:
+                ranks = extrapolate(iterates)
+
+
+def aitken(iterates):
+    """
+    Return ranks extrapolated from the last three `iterates` with
+    Aitken's delta-squared process, page by page.
+    """
+    x0, x1, x2 = list(iterates)[-3:]
+    denominator = x2 - 2 * x1 + x0
+    valid = np.abs(denominator) > 1e-15
+    ranks = x2.copy()
+    ranks[valid] -= (x2 - x1)[valid] ** 2 / denominator[valid]
+    ranks = np.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def quadratic(iterates):
+    """
+    Return ranks extrapolated from the last four `iterates`, assuming
+    they are mostly made of the PageRank vector and two other
+    eigenvectors of the transition matrix.
+    """
+    x0, x1, x2, x3 = iterates
+    y = np.column_stack([x1 - x0, x2 - x0])
+    gamma1, gamma2 = np.linalg.lstsq(y, -(x3 - x0), rcond=None)[0]
+    ranks = (gamma1 + gamma2 + 1) * x1 + (gamma2 + 1) * x2 + x3
+    ranks = np.maximum(ranks, 0)
+    return ranks / ranks.sum()
+
+
+def gauss_seidel(matrix, dangling, damping_factor, tolerance=TOLERANCE, norm=1,
+                 ranks=None):
+    """
+    Return a tuple (ranks, history) like `power_iteration`, but updating
+    pages in order within each iteration, so that every page already
+    uses the new ranks of the pages before it.
+    """
+    N = matrix.shape[0]
+    if ranks is None:
+        ranks = np.full(N, 1 / N)
+
+    # Each sweep solves for the links from earlier pages and to the page
+    # itself, and takes the links from later pages from the last sweep
+    lower = (sparse.identity(N, format="csr")
+             - damping_factor * sparse.tril(matrix, format="csr"))
+    upper = damping_factor * sparse.triu(matrix, k=1, format="csr")
+
+    history = []
+    while True:
+        spread = (1 - damping_factor + damping_factor * ranks[dangling].sum()) / N
+        new_ranks = spsolve_triangular(lower, upper @ ranks + spread, lower=True)
+        new_ranks /= new_ranks.sum()
+        history.append(np.linalg.norm(new_ranks - ranks, ord=norm))
+        ranks = new_ranks
+        if history[-1] <= tolerance:
+            return ranks, history
+
+
+def adaptive_iteration(matrix, dangling, damping_factor, tolerance=TOLERANCE, norm=1,
+                       ranks=None):
+    """
+    Return a tuple (ranks, history) like `power_iteration`, but no longer
+    recomputing the ranks of pages once they have changed by at most
+    `tolerance` of themselves for SETTLED iterations in a row.
+
+    Once the pages still recomputed have converged, one full iteration
+    checks the frozen ones too, and any that still move are recomputed
+    again.
+    """
+    N = matrix.shape[0]
+    if ranks is None:
+        ranks = np.full(N, 1 / N)
+
+    active = np.arange(N)
+    rows = matrix
+    settled = np.zeros(N, dtype=np.int64)
+    history = []
+    while True:
+        spread = (1 - damping_factor + damping_factor * ranks[dangling].sum()) / N
+        new_ranks = ranks.copy()
+        new_ranks[active] = damping_factor * (rows @ ranks) + spread
+        change = new_ranks - ranks
+        history.append(np.linalg.norm(change, ord=norm))
+        ranks = new_ranks
+
+        if history[-1] <= tolerance and len(active) < N:
+            # Check every page, frozen or not, with a full iteration
+            spread = (1 - damping_factor + damping_factor * ranks[dangling].sum()) / N
+            new_ranks = damping_factor * (matrix @ ranks) + spread
+            change = new_ranks - ranks
+            history.append(np.linalg.norm(change, ord=norm))
+            ranks = new_ranks
+
+            # Pages that moved are recomputed again
+            moved = np.abs(change) > tolerance * ranks
+            settled[moved] = 0
+            active = np.flatnonzero(settled < SETTLED)
+            rows = matrix[active]
+
+        if history[-1] <= tolerance:
+            return ranks / ranks.sum(), history
+        if len(history) <= WARMUP:
+            continue
+
+        # Pages are frozen once converged for long enough, and only when
+        # there are enough of them to be worth cutting their rows out
+        calm = np.abs(change[active]) <= tolerance * ranks[active]
+        settled[active] = np.where(calm, settled[active] + 1, 0)
+        keep = settled[active] < SETTLED
+        if not keep.all() and keep.sum() <= (1 - FREEZE) * len(active):
+            active = active[keep]
+            rows = matrix[active]
+
+
+# Methods to compute PageRank by iteration, by name
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "aitken": functools.partial(power_iteration, extrapolate=aitken),
+    "quadratic": functools.partial(power_iteration, extrapolate=quadratic),
+    "adaptive": adaptive_iteration
+}
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE, norm=1,
+                     method="power"):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -123,28 +496,345 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    N = len(corpus)
-    pagerank = {page: 1/N for page in corpus.keys()}
+    ranks, _ = solve_pagerank(corpus, damping_factor, method, tolerance, norm)
+    return ranks
+
+
+def solve_pagerank(corpus, damping_factor, method="power", tolerance=TOLERANCE,
+                   norm=1):
+    """
+    Return a tuple (ranks, history) with the PageRank values of
+    `corpus` computed by the solver named `method` in SOLVERS, and the
+    change in ranks after each of its iterations.
+    """
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {list(SOLVERS)}")
+    pages, matrix, dangling = link_matrix(corpus)
+    ranks, history = SOLVERS[method](matrix, dangling, damping_factor, tolerance, norm)
+    return dict(zip(pages, ranks.tolist())), history
+
+
+def update_pagerank(corpus, ranks, damping_factor, added=(), removed=(),
+                    tolerance=TOLERANCE):
+    """
+    Return a tuple (corpus, ranks) with the corpus and PageRank values
+    after adding the links in `added` and removing those in `removed`,
+    both iterables of (page, link) pairs, from `corpus`, whose PageRank
+    values were `ranks`. Pages named in added links that are not yet in
+    the corpus join it. `corpus` itself is left unchanged.
+
+    Rather than iterating over the whole corpus again, this starts from
+    `ranks` and pushes the rank displaced by the changes through the
+    links, one page at a time, until no page holds more than `tolerance`
+    of it, in units of the rank a page would get from random jumps alone.
+    """
+    # Ranks are scaled to solve `scores = 1 + damping_factor * M scores`,
+    # where pages without links link nowhere: the solution is proportional
+    # to PageRank, and a change in it only spreads along links
+    dangling = sum(ranks[page] for page in corpus if not corpus[page])
+    scale = len(corpus) / (1 - damping_factor + damping_factor * dangling)
+    scores = {page: rank * scale for page, rank in ranks.items()}
+    residuals = dict()
+
+    # Gather the changes to the links of each page
+    changes = dict()
+    for page, link in added:
+        changes.setdefault(page, (set(), set()))[0].add(link)
+    for page, link in removed:
+        changes.setdefault(page, (set(), set()))[1].add(link)
+
+    corpus = dict(corpus)
+    for page, link in added:
+        for new_page in [page, link]:
+            if new_page not in corpus:
+                corpus[new_page] = set()
+                scores[new_page] = 0
+                residuals[new_page] = 1
+
+    # Move the score a page passes on from its old links to its new ones
+    for page, (additions, removals) in changes.items():
+        if page not in corpus:
+            continue
+        links = corpus[page]
+        new_links = (links | additions) - removals - {page}
+        if new_links == links:
+            continue
+        share = damping_factor * scores[page]
+        for link in links:
+            residuals[link] = residuals.get(link, 0) - share / len(links)
+        for link in new_links:
+            residuals[link] = residuals.get(link, 0) + share / len(new_links)
+        corpus[page] = new_links
+
+    # Push residuals above the tolerance to the pages linked to
+    queue = deque(page for page in residuals if abs(residuals[page]) > tolerance)
+    while queue:
+        page = queue.popleft()
+        residual = residuals.pop(page, 0)
+        if abs(residual) <= tolerance:
+            residuals[page] = residual
+            continue
+        scores[page] += residual
+        links = corpus[page]
+        for link in links:
+            before = residuals.get(link, 0)
+            after = before + damping_factor * residual / len(links)
+            residuals[link] = after
+            if abs(before) <= tolerance < abs(after):
+                queue.append(link)
+
+    total = sum(scores.values())
+    return corpus, {page: score / total for page, score in scores.items()}
 
-    for page in corpus:
-        if not corpus[page]: #checks if the current page doesn’t have any outgoing links
-            corpus[page] = set(corpus.keys())
 
-    change = float('inf')
-    while change > 0.001:
-        new_pagerank = {}
-        for page in corpus:
-            total = float(0) #sum of pages that link to current page
-            for possible_page in corpus:
-                if page in corpus[possible_page]:
-                    total += pagerank[possible_page] / len(corpus[possible_page]) #page divided among all the pages it links to: PR(i)/Numlinks(i)
-            new_pagerank[page] = (1-damping_factor) / N + damping_factor * total
+def save_edges(directory, pages, sources, destinations, block=EDGE_BLOCK):
+    """
+    Save a link graph to `directory` for `stream_pagerank`, given the
+    names of its pages and the indices of the source and destination
+    page of each link, which may themselves be memory-mapped.
 
-        change = sum(abs(new_pagerank[page] - pagerank[page]) for page in corpus)
+    The links are written as int32 arrays sorted by destination, next to
+    the number of links from each page, and sorted `block` links at a
+    time so that they never all have to be in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    N = len(pages)
+    E = len(sources)
+    np.save(os.path.join(directory, "pages.npy"), np.array(pages, dtype=str))
+
+    # Count links from and to each page
+    degrees = np.zeros(N, dtype=np.int64)
+    cursors = np.zeros(N, dtype=np.int64)
+    for start in range(0, E, block):
+        degrees += np.bincount(sources[start:start + block], minlength=N)
+        cursors += np.bincount(destinations[start:start + block], minlength=N)
+    np.save(os.path.join(directory, "degrees.npy"), degrees.astype(np.int32))
+
+    # Links to each page start where the links to the pages before it end
+    cursors = np.cumsum(cursors) - cursors
+    sorted_sources = np.lib.format.open_memmap(
+        os.path.join(directory, "sources.npy"), mode="w+", dtype=np.int32, shape=(E,)
+    )
+    sorted_destinations = np.lib.format.open_memmap(
+        os.path.join(directory, "destinations.npy"), mode="w+", dtype=np.int32, shape=(E,)
+    )
+    for start in range(0, E, block):
+        order = np.argsort(destinations[start:start + block], kind="stable")
+        block_sources = np.asarray(sources[start:start + block])[order]
+        block_destinations = np.asarray(destinations[start:start + block])[order]
+
+        # Links to the same page go one after the other from its cursor
+        first = np.searchsorted(block_destinations, block_destinations)
+        positions = cursors[block_destinations] + np.arange(len(order)) - first
+        sorted_sources[positions] = block_sources
+        sorted_destinations[positions] = block_destinations
+        cursors += np.bincount(block_destinations, minlength=N)
+
+    sorted_sources.flush()
+    sorted_destinations.flush()
+
+
+def stream_pagerank(directory, damping_factor, tolerance=TOLERANCE, norm=1,
+                    block=EDGE_BLOCK):
+    """
+    Return a tuple (ranks, history) like `power_iteration`, for the link
+    graph saved to `directory` by `save_edges`. The links stay on disk
+    and are read `block` at a time in each iteration, so only vectors
+    with one value per page are kept in memory.
+    """
+    degrees = np.load(os.path.join(directory, "degrees.npy"))
+    sources = np.load(os.path.join(directory, "sources.npy"), mmap_mode="r")
+    destinations = np.load(os.path.join(directory, "destinations.npy"), mmap_mode="r")
+    N = len(degrees)
+    E = len(sources)
+    dangling = degrees == 0
+
+    ranks = np.full(N, 1 / N)
+    history = []
+    while True:
+        # Rank each page passes along each of its links
+        shares = np.divide(ranks, degrees, out=np.zeros(N), where=~dangling)
+
+        # Links are sorted by destination, so a block only adds to a range of pages
+        new_ranks = np.zeros(N)
+        for start in range(0, E, block):
+            block_destinations = destinations[start:start + block]
+            first = block_destinations[0]
+            new_ranks[first:block_destinations[-1] + 1] += np.bincount(
+                block_destinations - first, weights=shares[sources[start:start + block]]
+            )
+
+        spread = (1 - damping_factor + damping_factor * ranks[dangling].sum()) / N
+        new_ranks = damping_factor * new_ranks + spread
+        history.append(np.linalg.norm(new_ranks - ranks, ord=norm))
+        ranks = new_ranks
+        if history[-1] <= tolerance:
+            return ranks, history
+
+
+class PersonalizedPageRank():
+    """
+    Personalized PageRank queries over a corpus: the PageRank of a
+    surfer who, instead of jumping to any page at random, jumps back to
+    one of a set of seed pages. Pages without links still lead to any
+    page at random, so that a query for every page at once gives back
+    the usual PageRank.
+    """
 
-        pagerank = new_pagerank
+    def __init__(self, corpus, damping_factor=DAMPING, walks=WALKS, seed=None):
+        """
+        Prepare queries over `corpus`, precomputing its PageRank and
+        `walks` random walks from each of its pages.
+        """
+        self.pages, self.offsets, self.links = link_lists(corpus)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        self.degrees = np.diff(self.offsets)
+        self.damping_factor = damping_factor
+
+        # Rank that spreads from pages without links is the usual PageRank
+        matrix, dangling = transition_matrix(self.offsets, self.links)
+        self.ranks, _ = power_iteration(matrix, dangling, damping_factor, tolerance=1e-10)
+        self.order = np.argsort(-self.ranks)
+
+        self.segments = self.walk(walks, np.random.default_rng(seed))
+
+    def walk(self, walks, rng):
+        """
+        Return an array with, for each page, the pages where `walks`
+        random walks from it end, each step ending the walk with
+        probability `1 - damping_factor`.
+        """
+        N = len(self.pages)
+        ends = np.repeat(np.arange(N), walks)
+        walking = np.arange(len(ends))
+        while len(walking):
+            # Walks that go on follow a link, or jump anywhere from pages without links
+            walking = walking[rng.random(len(walking)) < self.damping_factor]
+            current = ends[walking]
+            follow = self.degrees[current] > 0
+            following = current[follow]
+            choice = (rng.random(len(following)) * self.degrees[following]).astype(np.int64)
+            ends[walking] = rng.integers(0, N, len(walking))
+            ends[walking[follow]] = self.links[self.offsets[following] + choice]
+        return ends.reshape(N, walks)
+
+    def seed_weights(self, seeds):
+        """
+        Return a tuple (indices, weights) for a seed page, a set of seed
+        pages, or a dictionary from seed pages to their weights.
+        """
+        if isinstance(seeds, dict):
+            weights = seeds
+        elif isinstance(seeds, (set, frozenset, list, tuple)):
+            weights = {page: 1 for page in seeds}
+        else:
+            weights = {seeds: 1}
+        if not weights:
+            raise ValueError("No seed pages")
+        indices = np.array([self.index[page] for page in weights])
+        weights = np.array(list(weights.values()), dtype=float)
+        return indices, weights / weights.sum()
+
+    def push(self, seeds, epsilon=EPSILON):
+        """
+        Return an array of personalized PageRank values for `seeds`,
+        pushing rank from the seeds along links until no page holds more
+        than `epsilon` per link of rank yet to be pushed, then sending the
+        rank left on each page along its precomputed walks.
+        """
+        N = len(self.pages)
+        estimate = np.zeros(N)
+        residual = np.zeros(N)
+        indices, weights = self.seed_weights(seeds)
+        residual[indices] = weights
+        thresholds = epsilon * np.maximum(self.degrees, 1)
+
+        # Rank pushed out of pages without links spreads to every page
+        spread = 0
+        queue = deque(indices[residual[indices] > thresholds[indices]].tolist())
+        queued = np.zeros(N, dtype=bool)
+        queued[queue] = True
+        while queue:
+            page = queue.popleft()
+            queued[page] = False
+            mass = residual[page]
+            residual[page] = 0
+            estimate[page] += (1 - self.damping_factor) * mass
+            if not self.degrees[page]:
+                spread += self.damping_factor * mass
+                continue
+            links = self.links[self.offsets[page]:self.offsets[page + 1]]
+            residual[links] += self.damping_factor * mass / len(links)
+            ready = links[(residual[links] > thresholds[links]) & ~queued[links]]
+            queued[ready] = True
+            queue.extend(ready.tolist())
+
+        # Rank left on a page ends up where the walks from it end
+        left = np.flatnonzero(residual)
+        segments = self.segments[left]
+        estimate += np.bincount(
+            segments.ravel(), weights=np.repeat(residual[left], segments.shape[1]),
+            minlength=N
+        ) / segments.shape[1]
+
+        return estimate + spread * self.ranks
+
+    def sample(self, seeds):
+        """
+        Return an array of personalized PageRank values for `seeds`,
+        estimated from where the precomputed walks from them end.
+        """
+        indices, weights = self.seed_weights(seeds)
+        segments = self.segments[indices]
+        return np.bincount(
+            segments.ravel(), weights=np.repeat(weights, segments.shape[1]),
+            minlength=len(self.pages)
+        ) / segments.shape[1]
+
+    def query(self, seeds, method="push", top=None):
+        """
+        Return a dictionary from pages to their personalized PageRank
+        values for `seeds`, computed with `method` ("push" or "sample"),
+        keeping only the `top` highest if given.
+        """
+        if method == "push":
+            ranks = self.push(seeds)
+        elif method == "sample":
+            ranks = self.sample(seeds)
+        else:
+            raise ValueError(f"Unknown method {method!r}, expected 'push' or 'sample'")
+        if top is None:
+            best = np.arange(len(ranks))
+        else:
+            best = np.argpartition(-ranks, min(top, len(ranks)) - 1)[:top]
+            best = best[np.argsort(-ranks[best])]
+        return {self.pages[i]: float(ranks[i]) for i in best.tolist()}
+
+    def batch(self, queries, method="push", top=None, processes=None):
+        """
+        Return the answers to a list of seed `queries`, computed on a
+        pool of `processes` processes, or in this process if
+        `processes` is 1.
+        """
+        if processes == 1:
+            return [self.query(seeds, method, top) for seeds in queries]
+        with multiprocessing.Pool(processes, initializer=share_queries, initargs=(self,)) as pool:
+            return pool.map(answer_query, [(seeds, method, top) for seeds in queries])
+
+
+# Personalized PageRank queries shared with the processes of a pool
+shared = dict()
+
+
+def share_queries(queries):
+    """Process pool initializer for `PersonalizedPageRank.batch`."""
+    shared["queries"] = queries
+
+
+def answer_query(args):
+    """Process pool entry point for `PersonalizedPageRank.batch`."""
+    return shared["queries"].query(*args)
 
-    return pagerank
 
 if __name__ == "__main__":
     main()
\ No newline at end of file